@@ -1,6 +1,7 @@
 from flask import Flask
 from flask_cors import CORS
 from routes import routes
+from finance_jobs import start_retrain_scheduler
 import os
 from dotenv import load_dotenv
 
@@ -28,4 +29,6 @@ CORS(app, resources={
 app.register_blueprint(routes)
 
 if __name__ == '__main__':
+    # serwer deweloperski; produkcyjnie: gunicorn -c gunicorn.conf.py app:app (harmonogram startuje tam w post_fork)
+    start_retrain_scheduler()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""Porównanie przepustowości silników sentymentu (artykuły/s) na stałym korpusie nagłówków.
+
+Użycie: python benchmarks/bench_sentiment.py [--repeat 50] [--backends lexicon textblob]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finance_sentiment import SENTIMENT_BACKENDS, get_sentiment_backend
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'news_corpus.json')
+
+
+def load_corpus(repeat: int) -> list:
+    with open(CORPUS_PATH, 'r', encoding='utf-8') as f:
+        headlines = json.load(f)
+    # numer na końcu, żeby teksty były unikalne tak jak w prawdziwym ruchu
+    return [f"{headline} {i}" for i in range(repeat) for headline in headlines]
+
+
+def run(backend_name: str, texts: list, rounds: int) -> float:
+    backend = get_sentiment_backend(backend_name)
+    backend.analyze_many(texts[:10])
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        backend.analyze_many(texts)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=50, help='ile razy powielić korpus')
+    parser.add_argument('--rounds', type=int, default=3, help='liczba pomiarów, bierzemy najlepszy')
+    parser.add_argument('--backends', nargs='+', default=list(SENTIMENT_BACKENDS))
+    args = parser.parse_args()
+
+    texts = load_corpus(args.repeat)
+    print(f"Korpus: {len(texts)} artykułów")
+    for name in args.backends:
+        try:
+            throughput = run(name, texts, args.rounds)
+            print(f"{name:>10}: {throughput:12.0f} artykułów/s")
+        except ImportError as e:
+            print(f"{name:>10}: pominięty ({e})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Wektorowy backtest strategii sygnałowych i metryki ryzyka w NumPy.
+
+Wszystkie funkcje przyjmują tablice 1-D (jedna strategia) albo 2-D (n_świeczek, n_strategii/tickerów)
+i liczą krzywe kapitału, drawdown, win rate oraz Sharpe'a skumulowanymi iloczynami i maksimami w jednym przebiegu.
+"""
+from typing import Any, Dict
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+INITIAL_VALUE = 1000
+
+
+def strategy_returns(signals: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    """Zwrot strategii w świeczce i: returns[i], jeśli sygnał z i-1 był 1 (kupuj), w przeciwnym razie 0"""
+    signals = np.asarray(signals)
+    returns = np.asarray(returns, dtype=float)
+    if returns.ndim < signals.ndim:
+        returns = np.broadcast_to(returns.reshape(returns.shape + (1,) * (signals.ndim - returns.ndim)), signals.shape)
+    out = np.zeros(np.broadcast_shapes(signals.shape, returns.shape))
+    active = (signals[:-1] == 1) & np.isfinite(returns[1:])
+    out[1:] = np.where(active, returns[1:], 0.0)
+    return out
+
+
+def simple_returns(close: np.ndarray) -> np.ndarray:
+    """Dzienna stopa zwrotu jak pct_change(); pierwszy wiersz = 0"""
+    close = np.asarray(close, dtype=float)
+    out = np.zeros_like(close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = close[1:] / close[:-1] - 1
+    out[~np.isfinite(out)] = 0.0
+    return out
+
+
+def equity_curve(period_returns: np.ndarray, initial_value: float = INITIAL_VALUE) -> np.ndarray:
+    return initial_value * np.cumprod(1 + np.asarray(period_returns, dtype=float), axis=0)
+
+
+def max_drawdown(equity: np.ndarray, initial_value: float = INITIAL_VALUE) -> np.ndarray:
+    """Największy spadek od szczytu (ułamek), szczyt liczony od kapitału początkowego"""
+    equity = np.asarray(equity, dtype=float)
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=0), initial_value)
+    return ((peaks - equity) / peaks).max(axis=0, initial=0.0)
+
+
+def sharpe_ratio(period_returns: np.ndarray, periods_per_year: float) -> np.ndarray:
+    period_returns = np.asarray(period_returns, dtype=float)
+    mean = period_returns.mean(axis=0)
+    std = period_returns.std(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), 0.0)
+    return sharpe
+
+
+def risk_metrics(period_returns: np.ndarray, periods_per_year: float,
+                 initial_value: float = INITIAL_VALUE) -> Dict[str, np.ndarray]:
+    """Sharpe (annualizowany), max drawdown, win rate, liczba transakcji i średni zwrot na transakcję"""
+    period_returns = np.asarray(period_returns, dtype=float)
+    trades = period_returns != 0
+    total_trades = trades.sum(axis=0)
+    wins = (period_returns > 0).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(total_trades > 0, wins / total_trades, 0.0)
+        average_return = np.where(total_trades > 0, period_returns.sum(axis=0) / total_trades, 0.0)
+    if len(period_returns):
+        drawdown = max_drawdown(equity_curve(period_returns, initial_value), initial_value)
+        sharpe = sharpe_ratio(period_returns, periods_per_year)
+    else:
+        drawdown = np.zeros(period_returns.shape[1:])
+        sharpe = np.zeros(period_returns.shape[1:])
+    return {
+        'sharpe_ratio': sharpe,
+        'max_drawdown': drawdown,
+        'win_rate': win_rate,
+        'total_trades': total_trades,
+        'average_return_per_trade': average_return
+    }
+
+
+def run_backtest(signals: np.ndarray, forward_returns: np.ndarray, close: np.ndarray,
+                 horizon: int = 1, initial_value: float = INITIAL_VALUE) -> Dict[str, Any]:
+    """Pełny backtest: krzywa strategii, krzywa kup-i-trzymaj i metryki ryzyka.
+
+    forward_returns to zwroty w horyzoncie `horizon` świeczek (np. 5-dniowe), więc Sharpe
+    annualizujemy liczbą takich okresów w roku.
+    """
+    strat = strategy_returns(signals, forward_returns)
+    close = np.asarray(close, dtype=float)
+    if close.ndim < strat.ndim:
+        close = close.reshape(close.shape + (1,) * (strat.ndim - close.ndim))
+    metrics = risk_metrics(strat[1:], TRADING_DAYS_PER_YEAR / horizon, initial_value)
+    return {
+        'strategy': equity_curve(strat, initial_value),
+        'buy_hold': np.broadcast_to(equity_curve(simple_returns(close), initial_value), strat.shape),
+        'metrics': metrics
+    }
@@ -0,0 +1,193 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+MISSING = object()
+
+
+def cache_path(*parts: str) -> str:
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def content_hash(*parts: str) -> str:
+    """Skrót treści niezależny od białych znaków, używany jako klucz cache"""
+    normalized = '\x1f'.join(re.sub(r'\s+', ' ', str(part)).strip() for part in parts)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+class PersistentCache:
+    """Słownik klucz -> wartość zapisywany na dysku (JSON) z TTL i cache'owaniem braku wyniku"""
+
+    def __init__(self, name: str, ttl: float, negative_ttl: Optional[float] = None):
+        self.path = cache_path(f'{name}.json')
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Błąd odczytu cache {self.path}: {e}")
+            return {}
+
+    def _save(self, removed: Optional[str] = None) -> None:
+        # scalanie z plikiem, żeby kilka procesów nie nadpisywało sobie wpisów
+        for key, entry in self._load().items():
+            if key == removed:
+                continue
+            current = self._entries.get(key)
+            if current is None or current['time'] < entry['time']:
+                self._entries[key] = entry
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Błąd zapisu cache {self.path}: {e}")
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        """Zwraca zapisaną wartość (także None dla zapamiętanego braku) albo default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            ttl = self.ttl if entry['value'] is not None else self.negative_ttl
+            if time.time() - entry['time'] > ttl:
+                del self._entries[key]
+                return default
+            return entry['value']
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = {'value': value, 'time': time.time()}
+            self._save()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._save(removed=key)
+
+
+class TTLCache:
+    """Cache w pamięci z TTL i limitem LRU; równoległe zapytania o ten sam klucz czekają na jedno pobranie"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._pending: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._lock:
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._pending[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+
+class SqliteCache:
+    """Trwały cache klucz -> wartość JSON w SQLite, bezpieczny dla wielu wątków i procesów"""
+
+    def __init__(self, name: str, ttl: Optional[float] = None):
+        self.path = cache_path(f'{name}.sqlite')
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, time REAL)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        found: Dict[str, Any] = {}
+        min_time = time.time() - self.ttl if self.ttl is not None else float('-inf')
+        conn = self._connect()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = conn.execute(
+                f'SELECT key, value, time FROM cache WHERE key IN ({",".join("?" * len(chunk))})', chunk
+            ).fetchall()
+            for key, value, stored_at in rows:
+                if stored_at >= min_time:
+                    found[key] = json.loads(value)
+        return found
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, time) VALUES (?, ?, ?)',
+                [(key, json.dumps(value, ensure_ascii=False), now) for key, value in items.items()]
+            )
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many({key: value})
@@ -0,0 +1,122 @@
+"""Kalendarze sesji giełdowych liczone lokalnie z reguł świąt (bez dostępu do sieci)."""
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+CALENDAR_YEARS = (1990, 2100)
+
+# sufiks tickera -> giełda; pozostałe tickery traktujemy jak NYSE
+CALENDAR_SUFFIXES = {
+    '.WA': 'GPW',
+}
+
+
+def easter_sundays(years: np.ndarray) -> np.ndarray:
+    """Wielkanoc (kalendarz gregoriański) dla wielu lat naraz - algorytm Meeusa/Jonesa/Butchera"""
+    a = years % 19
+    b = years // 100
+    c = years % 100
+    d = b // 4
+    e = b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i = c // 4
+    k = c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return _dates(years, month, day)
+
+
+def _dates(years, months, days) -> np.ndarray:
+    years = np.broadcast_to(np.asarray(years), np.broadcast(years, months, days).shape)
+    months = np.broadcast_to(np.asarray(months), years.shape)
+    days = np.broadcast_to(np.asarray(days), years.shape)
+    first = (years - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (months - 1)
+    return first.astype('datetime64[D]') + (days - 1)
+
+
+def _nth_weekday(years: np.ndarray, month: int, weekday: int, n: int) -> np.ndarray:
+    """n-ty dany dzień tygodnia w miesiącu (weekday: 0 = poniedziałek), n = -1 oznacza ostatni"""
+    if n > 0:
+        first = _dates(years, month, 1)
+        shift = (weekday - _weekday(first)) % 7
+        return first + shift + 7 * (n - 1)
+    last = _dates(years, month + 1, 1) - 1 if month < 12 else _dates(years, 12, 31)
+    return last - (_weekday(last) - weekday) % 7
+
+
+def _weekday(dates: np.ndarray) -> np.ndarray:
+    # 1970-01-01 był czwartkiem
+    return (dates.astype('datetime64[D]').astype(np.int64) + 3) % 7
+
+
+def _observed_us(dates: np.ndarray) -> np.ndarray:
+    """Święto w sobotę -> piątek, w niedzielę -> poniedziałek"""
+    weekday = _weekday(dates)
+    return dates + np.where(weekday == 5, -1, np.where(weekday == 6, 1, 0))
+
+
+def nyse_holidays(years: np.ndarray) -> np.ndarray:
+    good_friday = easter_sundays(years) - 2
+    new_year = _observed_us(_dates(years, 1, 1))
+    # Nowy Rok w sobotę nie przesuwa się na piątek 31 grudnia
+    new_year = new_year[_weekday(_dates(years, 1, 1)) != 5]
+    juneteenth_years = years[years >= 2022]
+    return np.concatenate([
+        new_year,
+        _nth_weekday(years[years >= 1998], 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(years, 2, 0, 3),                  # Presidents' Day
+        good_friday,
+        _nth_weekday(years, 5, 0, -1),                 # Memorial Day
+        _observed_us(_dates(juneteenth_years, 6, 19)),
+        _observed_us(_dates(years, 7, 4)),
+        _nth_weekday(years, 9, 0, 1),                  # Labor Day
+        _nth_weekday(years, 11, 3, 4),                 # Thanksgiving
+        _observed_us(_dates(years, 12, 25)),
+    ])
+
+
+def gpw_holidays(years: np.ndarray) -> np.ndarray:
+    easter = easter_sundays(years)
+    fixed = [(1, 1), (5, 1), (5, 3), (8, 15), (11, 1), (11, 11), (12, 24), (12, 25), (12, 26), (12, 31)]
+    return np.concatenate(
+        [_dates(years, month, day) for month, day in fixed] + [
+            _dates(years[years >= 2011], 1, 6),        # Trzech Króli
+            easter - 2,                                 # Wielki Piątek
+            easter + 1,                                 # Poniedziałek Wielkanocny
+            easter + 60,                                # Boże Ciało
+        ]
+    )
+
+
+HOLIDAY_RULES = {
+    'NYSE': nyse_holidays,
+    'GPW': gpw_holidays,
+}
+
+
+@lru_cache(maxsize=None)
+def get_calendar(exchange: str) -> np.busdaycalendar:
+    years = np.arange(CALENDAR_YEARS[0], CALENDAR_YEARS[1] + 1)
+    holidays = np.unique(HOLIDAY_RULES[exchange](years))
+    return np.busdaycalendar(weekmask='1111100', holidays=holidays)
+
+
+def exchange_for_ticker(ticker: str) -> str:
+    ticker = ticker.upper()
+    for suffix, exchange in CALENDAR_SUFFIXES.items():
+        if ticker.endswith(suffix):
+            return exchange
+    return 'NYSE'
+
+
+def next_sessions(ticker: str, last_date, steps: int) -> pd.DatetimeIndex:
+    """Kolejne `steps` sesji giełdowych po last_date (liczone od ostatniej sesji <= last_date)"""
+    calendar = get_calendar(exchange_for_ticker(ticker))
+    start = np.datetime64(pd.Timestamp(last_date).date(), 'D')
+    sessions = np.busday_offset(start, np.arange(1, steps + 1), roll='backward', busdaycal=calendar)
+    return pd.DatetimeIndex(sessions)
+
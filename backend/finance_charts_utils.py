@@ -1,28 +1,26 @@
 from typing import Optional, Dict, Any
-import yfinance as yf
-import google.generativeai as genai
 import os
-import requests
 import pandas as pd
 import json
 import re
+import threading
 from datetime import datetime, timedelta
+from finance_cache import PersistentCache, MISSING
+from finance_store import get_price_store
+from finance_metadata import get_ticker_info
+from finance_fx import get_fx_provider
+from finance_technicals import rolling_mean
+
+TICKER_CACHE_TTL = float(os.getenv('TICKER_CACHE_TTL', 30 * 24 * 3600))
+TICKER_CACHE_NEGATIVE_TTL = float(os.getenv('TICKER_CACHE_NEGATIVE_TTL', 24 * 3600))
 
 class StockDataFetcher:
     def __init__(self):
-        self.cache = {}
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if api_key:
-            try:
-                genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-                print("Model AI skonfigurowany pomyślnie")
-            except Exception as e:
-                print(f"Błąd konfiguracji modelu AI: {e}")
-                self.model = None
-        else:
-            print("Ostrzeżenie: Brak GOOGLE_API_KEY")
-            self.model = None
+        # nazwa firmy -> ticker, None oznacza zapamiętany brak tickera
+        self.cache = PersistentCache('ticker_resolution', TICKER_CACHE_TTL, TICKER_CACHE_NEGATIVE_TTL)
+        # model AI tworzony dopiero, gdy nazwy firmy nie ma w słowniku ani w cache
+        self._model = MISSING
+        self._model_lock = threading.Lock()
 
         self.company_tickers = {
             'apple': 'AAPL',
@@ -75,14 +73,40 @@ class StockDataFetcher:
             'allegro': 'ALE.WA',
         }
 
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is MISSING:
+                self._model = self._create_model()
+            return self._model
+
+    @staticmethod
+    def _create_model():
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            print("Ostrzeżenie: Brak GOOGLE_API_KEY")
+            return None
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            print("Model AI skonfigurowany pomyślnie")
+            return model
+        except Exception as e:
+            print(f"Błąd konfiguracji modelu AI: {e}")
+            return None
+
     def get_ticker_from_ai(self, company_name: str) -> Optional[str]:
+        # wcześniej rozwiązane nazwy (także negatywne wpisy) działają bez modelu i bez klucza API
+        cache_key = company_name.strip().lower()
+        cached_ticker = self.cache.get(cache_key)
+        if cached_ticker is not MISSING:
+            return cached_ticker
+
         if not self.model:
             print("Błąd: Brak skonfigurowanego modelu AI")
             return None
 
-        if company_name in self.cache:
-            return self.cache[company_name]
-
         try:
             prompt = f"""
             Znajdź ticker giełdowy dla firmy "{company_name}".
@@ -100,8 +124,10 @@ class StockDataFetcher:
                 
                 if data['confidence'] >= 50:
                     if self.verify_ticker(data['ticker'], company_name):
-                        self.cache[company_name] = data['ticker']
+                        self.cache.set(cache_key, data['ticker'])
                         return data['ticker']
+
+                self.cache.set(cache_key, None)
                         
             except json.JSONDecodeError as e:
                 print(f"Błąd parsowania JSON dla odpowiedzi AI: {result}")
@@ -115,8 +141,7 @@ class StockDataFetcher:
 
     def verify_ticker(self, ticker: str, company_name: str) -> bool:
         try:
-            ticker_info = yf.Ticker(ticker)
-            company_info = ticker_info.info
+            company_info = get_ticker_info(ticker)
             
             fields_to_check = [
                 'shortName',
@@ -163,36 +188,34 @@ class StockDataFetcher:
 
     def fetch_stock_data(self, ticker: str, period: str, interval: str, original_query: str) -> Optional[Dict[str, Any]]:
         try:
-            data = yf.download(ticker, period=period, interval=interval)
+            data = get_price_store().get_history(ticker, period=period, interval=interval)
             
             if data.empty:
                 print(f"Brak danych dla tickera: {ticker}")
                 return None
 
+            info = get_ticker_info(ticker)
+            currency = info.get('currency', 'USD')
+            if currency != 'USD':
+                converted = get_fx_provider().convert_to_usd(data, currency)
+                if converted is not None:
+                    data = converted
+                    currency = 'USD'
+
+            # ten sam kształt kolumn co z yf.download, frontend oczekuje np. Close_AAPL
+            data.columns = pd.MultiIndex.from_product([data.columns, [ticker]], names=['Price', 'Ticker'])
             data = data.reset_index()
             if isinstance(data.columns, pd.MultiIndex):
                 data.columns = ['_'.join(col).strip() for col in data.columns.values]
             else:
                 data.columns = [col.lower() for col in data.columns]
 
-            ticker_info = yf.Ticker(ticker)
-            currency = ticker_info.info.get('currency', 'USD')
-            
-            if currency != 'USD':
-                exchange_rate = self.get_exchange_rate(currency)
-                if exchange_rate:
-                    price_columns = ['open', 'high', 'low', 'close', 'adj close']
-                    for col in price_columns:
-                        if col in data.columns:
-                            data[col] *= exchange_rate
-
             close_col = next((col for col in data.columns if 'close' in col.lower()), None)
             if not close_col:
                 print(f"Nie znaleziono kolumny 'close' dla {ticker}")
                 return None
 
-            sma_50 = data[close_col].rolling(window=50).mean()
-            info = ticker_info.info
+            sma_50 = pd.Series(rolling_mean(data[close_col].to_numpy(dtype=float), 50), index=data.index, name=close_col)
             company_info = {
                 'name': info.get('longName', original_query),
                 'sector': info.get('sector', 'Brak danych'),
@@ -209,7 +232,7 @@ class StockDataFetcher:
                 'companyInfo': company_info,
                 'stockData': data.to_dict(orient='records'),
                 'smaData': sma_50.dropna().reset_index().to_dict(orient='records'),
-                'currency': 'USD'
+                'currency': currency
             }
 
         except Exception as e:
@@ -217,19 +240,22 @@ class StockDataFetcher:
             return None
 
     def get_exchange_rate(self, from_currency: str, to_currency: str = 'USD') -> Optional[float]:
-        try:
-            url = f'https://api.exchangerate-api.com/v4/latest/{from_currency}'
-            response = requests.get(url)
-            data = response.json()
-            return data['rates'].get(to_currency)
-        except Exception as e:
-            print(f"Błąd pobierania kursu wymiany {from_currency} -> {to_currency}: {e}")
-            return None
+        return get_fx_provider().get_rate(from_currency, to_currency)
+
+_fetcher: Optional[StockDataFetcher] = None
+_fetcher_lock = threading.Lock()
+
+def get_fetcher() -> StockDataFetcher:
+    """Jeden StockDataFetcher na proces, współdzielony przez wszystkie wątki"""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = StockDataFetcher()
+    return _fetcher
 
 def get_stock_data_by_ticker(ticker: str, period: str = '1mo', interval: str = '1d') -> Optional[Dict[str, Any]]:
-    fetcher = StockDataFetcher()
-    return fetcher.fetch_stock_data(ticker, period, interval, ticker)
+    return get_fetcher().fetch_stock_data(ticker, period, interval, ticker)
 
 def get_stock_data_by_company_name(company_name: str, period: str = '1mo', interval: str = '1d') -> Optional[Dict[str, Any]]:
-    fetcher = StockDataFetcher()
-    return fetcher.get_stock_data(company_name, period, interval)
\ No newline at end of file
+    return get_fetcher().get_stock_data(company_name, period, interval)
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, Optional
+import pandas as pd
+import requests
+from finance_store import get_price_store
+
+FX_RATES_URL = os.getenv('FX_RATES_URL', 'https://api.exchangerate-api.com/v4/latest/USD')
+FX_RATES_TTL = float(os.getenv('FX_RATES_TTL', 3600))
+FX_REQUEST_TIMEOUT = float(os.getenv('FX_REQUEST_TIMEOUT', 5))
+# lokalny plik z kursami (np. do testów offline): {"rates": {"PLN": 4.0}, "history": {"PLN": {"2024-01-02": 0.25}}}
+FX_RATES_FILE = os.getenv('FX_RATES_FILE')
+# od jakiej długości szeregu (w dniach) przeliczamy każdą świeczkę kursem z jej dnia
+FX_HISTORICAL_MIN_DAYS = int(os.getenv('FX_HISTORICAL_MIN_DAYS', 31))
+
+PRICE_COLUMNS = {'open', 'high', 'low', 'close', 'adj close'}
+
+# waluty notowane w jednostkach drobnych (np. pensy na LSE)
+MINOR_UNITS = {'GBp': ('GBP', 100), 'GBX': ('GBP', 100), 'ZAc': ('ZAR', 100), 'ILA': ('ILS', 100)}
+
+
+def price_columns(columns) -> list:
+    """Kolumny z cenami, także po spłaszczeniu MultiIndexu (np. Close_CDR.WA)"""
+    return [col for col in columns if str(col).split('_')[0].lower() in PRICE_COLUMNS]
+
+
+class FxRateProvider:
+    """Kursy walut do USD: cała tabela pobierana raz i trzymana w pamięci przez FX_RATES_TTL"""
+
+    def __init__(self, rates_file: Optional[str] = FX_RATES_FILE, ttl: float = FX_RATES_TTL):
+        self.rates_file = rates_file
+        self.ttl = ttl
+        self._rates: Dict[str, float] = {}
+        self._history: Dict[str, pd.Series] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load_table(self) -> Dict[str, float]:
+        if self.rates_file:
+            with open(self.rates_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._history = {}
+            for currency, values in data.get('history', {}).items():
+                history = pd.Series(values, dtype=float)
+                history.index = pd.to_datetime(history.index)
+                self._history[currency] = history.sort_index()
+        else:
+            response = requests.get(FX_RATES_URL, timeout=FX_REQUEST_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        return data['rates']
+
+    def _table(self) -> Dict[str, float]:
+        with self._lock:
+            if not self._rates or time.time() - self._loaded_at > self.ttl:
+                try:
+                    self._rates = self._load_table()
+                    self._loaded_at = time.time()
+                except Exception as e:
+                    # przy błędzie zostajemy przy poprzedniej tabeli, jeśli jakaś była
+                    print(f"Błąd pobierania tabeli kursów walut: {e}")
+            return self._rates
+
+    def get_rate(self, from_currency: str, to_currency: str = 'USD') -> Optional[float]:
+        divisor = 1
+        if from_currency in MINOR_UNITS:
+            from_currency, divisor = MINOR_UNITS[from_currency]
+        rates = self._table()
+        # tabela ma bazę USD: rates[X] = ile X za 1 USD
+        from_rate = 1.0 if from_currency == 'USD' else rates.get(from_currency)
+        to_rate = 1.0 if to_currency == 'USD' else rates.get(to_currency)
+        if not from_rate or not to_rate:
+            return None
+        return to_rate / from_rate / divisor
+
+    def _historical_rates(self, currency: str, index: pd.DatetimeIndex) -> Optional[pd.Series]:
+        divisor = 1
+        if currency in MINOR_UNITS:
+            currency, divisor = MINOR_UNITS[currency]
+
+        days = index.tz_localize(None) if index.tz is not None else index
+        days = days.normalize()
+
+        if self.rates_file:
+            self._table()
+            history = self._history.get(currency)
+        else:
+            fx_data = get_price_store().get_history(f'{currency}USD=X', interval='1d', start=days[0].date().isoformat())
+            history = fx_data['Close'] if 'Close' in fx_data else None
+
+        if history is None or history.empty:
+            return None
+
+        history = history[~history.index.duplicated(keep='last')]
+        rates = history.reindex(history.index.union(days.unique())).ffill().bfill().reindex(days)
+        return pd.Series(rates.values / divisor, index=index)
+
+    def convert_to_usd(self, data: pd.DataFrame, currency: str, historical: Optional[bool] = None) -> Optional[pd.DataFrame]:
+        """Przelicza kolumny cenowe na USD; zwraca None, gdy nie udało się ustalić kursu"""
+        if currency == 'USD':
+            return data
+        columns = price_columns(data.columns)
+        if not columns:
+            return data
+
+        if historical is None:
+            historical = isinstance(data.index, pd.DatetimeIndex) and len(data.index) > 0 and \
+                (data.index[-1] - data.index[0]).days >= FX_HISTORICAL_MIN_DAYS
+
+        if historical:
+            try:
+                rates = self._historical_rates(currency, data.index)
+                if rates is not None:
+                    data[columns] = data[columns].mul(rates, axis=0)
+                    return data
+            except Exception as e:
+                print(f"Błąd pobierania historycznych kursów {currency}: {e}")
+
+        rate = self.get_rate(currency)
+        if rate is None:
+            return None
+        data[columns] = data[columns] * rate
+        return data
+
+
+_provider: Optional[FxRateProvider] = None
+_provider_lock = threading.Lock()
+
+def get_fx_provider() -> FxRateProvider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = FxRateProvider()
+    return _provider
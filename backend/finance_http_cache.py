@@ -0,0 +1,127 @@
+"""Cache odpowiedzi HTTP dla endpointów GET: ETag, 304 przy If-None-Match i kompresja dużych odpowiedzi JSON.
+
+Odpowiedź 200 zapamiętywana jest w pamięci procesu pod kluczem (endpoint, znormalizowane parametry) na czas
+zależny od endpointu. ETag to skrót treści, więc klient z aktualną kopią dostaje 304 bez ciała. Kompresja
+(brotli, jeśli pakiet jest zainstalowany, inaczej gzip) liczona jest raz na wpis i tylko powyżej progu.
+"""
+import os
+import gzip
+import time
+import hashlib
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Union
+from flask import Response, request
+from finance_cache import TTLCache, content_hash, MISSING
+
+HTTP_CACHE_SIZE = int(os.getenv('HTTP_CACHE_SIZE', 512))
+HTTP_COMPRESS_MIN_BYTES = int(os.getenv('HTTP_COMPRESS_MIN_BYTES', 1024))
+HTTP_GZIP_LEVEL = int(os.getenv('HTTP_GZIP_LEVEL', 6))
+HTTP_BROTLI_QUALITY = int(os.getenv('HTTP_BROTLI_QUALITY', 5))
+
+# wpisy wygasają według własnego TTL endpointu, TTLCache pilnuje tylko limitu LRU
+_responses = TTLCache(maxsize=HTTP_CACHE_SIZE, ttl=float('inf'))
+
+Ttl = Union[float, Callable[[Dict[str, str]], float]]
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return _brotli().compress(body, quality=HTTP_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=HTTP_GZIP_LEVEL)
+
+
+def _negotiate_encoding(size: int) -> Optional[str]:
+    if size < HTTP_COMPRESS_MIN_BYTES:
+        return None
+    accepted = request.accept_encodings
+    if _brotli() is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def normalized_args(defaults: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Parametry zapytania bez pustych wartości, z uzupełnionymi domyślnymi - ?period=1mo i brak period to ten sam wpis"""
+    args = dict(defaults or {})
+    for name in request.args:
+        value = ','.join(v.strip() for v in request.args.getlist(name)).strip(',')
+        if value:
+            args[name] = value
+    return dict(sorted(args.items()))
+
+
+def _etag(entry: Dict[str, Any], encoding: Optional[str]) -> str:
+    # silny ETag musi różnić się między reprezentacjami (gzip/br/bez kompresji) tej samej treści
+    return f"{entry['digest']}-{encoding}" if encoding else entry['digest']
+
+
+def _not_modified(entry: Dict[str, Any]) -> bool:
+    etags = request.if_none_match
+    return any(etags.contains_weak(_etag(entry, encoding)) for encoding in (None, 'gzip', 'br'))
+
+
+def _respond(entry: Dict[str, Any], hit: bool) -> Response:
+    encoding = _negotiate_encoding(len(entry['body']))
+    max_age = max(0, int(entry['expires_at'] - time.time()))
+
+    if _not_modified(entry):
+        response = Response(status=304)
+    else:
+        body = entry['body']
+        if encoding:
+            if encoding not in entry['encoded']:
+                entry['encoded'][encoding] = _compress(body, encoding)
+            body = entry['encoded'][encoding]
+        response = Response(body, status=200, mimetype=entry['mimetype'])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(_etag(entry, encoding))
+    response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+def cached_response(ttl: Ttl, defaults: Optional[Dict[str, str]] = None):
+    """Dekorator widoku GET. ttl w sekundach albo funkcja znormalizowanych parametrów zwracająca TTL.
+
+    Zapamiętywane są tylko odpowiedzi 200 - błędy i 202 (zadanie w tle) przechodzą bez zmian.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            params = normalized_args(defaults)
+            key = content_hash(request.endpoint, repr(sorted(kwargs.items())), repr(params))
+
+            entry = _responses.get(key)
+            if entry is not MISSING and entry['expires_at'] > time.time():
+                return _respond(entry, hit=True)
+
+            response = view(*args, **kwargs)
+            if not isinstance(response, Response) or response.status_code != 200 or response.is_streamed:
+                return response
+
+            body = response.get_data()
+            lifetime = ttl(params) if callable(ttl) else ttl
+            entry = {
+                'body': body,
+                'mimetype': response.mimetype,
+                'digest': hashlib.sha256(body).hexdigest()[:32],
+                'expires_at': time.time() + lifetime,
+                'encoded': {},
+            }
+            if lifetime > 0:
+                _responses.set(key, entry)
+            return _respond(entry, hit=False)
+        return wrapper
+    return decorator
@@ -1,9 +1,8 @@
-import yfinance as yf
+from finance_metadata import get_ticker_info
 
 def get_financial_indicators(ticker):
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = get_ticker_info(ticker)
 
         indicators = {
             "marketCap": info.get("marketCap"),
@@ -1,13 +1,22 @@
 import numpy as np
 import pandas as pd
-import yfinance as yf
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, mean_squared_error, mean_absolute_error
 import datetime
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
+from finance_metadata import get_ticker_info
+from finance_llm import generate_text, stream_text
+from finance_jobs import report_progress
+from finance_technicals import add_indicators, get_indicators, compute_indicator_arrays
+from finance_store import get_price_store
+from finance_cache import TTLCache, cache_path, MISSING
+from finance_backtest import run_backtest, strategy_returns, risk_metrics, TRADING_DAYS_PER_YEAR
+import re
+import glob
+import time
+import joblib
 import warnings
 
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -15,53 +24,34 @@ warnings.filterwarnings("ignore", category=UserWarning)
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# horyzont zwrotu, którego znak przewiduje model (Return_5day)
+RETURN_HORIZON = 5
+MODEL_FEATURES = ['SMA20', 'SMA50', 'SMA200', 'RSI', 'MACD', 'Signal', 'MACD_Hist', 'BB_Width']
+# zmiana cech lub sposobu ich liczenia wymaga podbicia wersji - stare modele zostaną wytrenowane od nowa
+FEATURE_SCHEMA_VERSION = 1
+# model jest trenowany ponownie, gdy jest starszy niż podany czas albo przybyło tyle nowych świeczek
+INVESTBOT_RETRAIN_AFTER = float(os.getenv('INVESTBOT_RETRAIN_AFTER', 7 * 24 * 3600))
+INVESTBOT_RETRAIN_BARS = int(os.getenv('INVESTBOT_RETRAIN_BARS', 5))
+
+_models_cache = TTLCache(maxsize=int(os.getenv('INVESTBOT_MEMORY_CACHE_SIZE', 64)), ttl=float('inf'))
 
 def get_stock_data(ticker, period="1y"):
     """Pobierz historyczne dane giełdowe"""
     try:
-        stock = yf.Ticker(ticker)
-        df = stock.history(period=period)
+        df = get_price_store().get_history(ticker, period=period)
         if df.empty:
             raise ValueError(f"Nie znaleziono danych dla tickera {ticker}")
         return df
     except Exception as e:
         raise Exception(f"Błąd podczas pobierania danych dla {ticker}: {str(e)}")
 
-def prepare_features(df):
-    """Przygotuj cechy dla modeli ML"""
-    data = df.copy()
-    
-    #wskaźniki techniczne
-    data['SMA20'] = data['Close'].rolling(window=20).mean()  # średnia krocząca z 20 dni
-    data['SMA50'] = data['Close'].rolling(window=50).mean()  # średnia krocząca z 50 dni
-    data['SMA200'] = data['Close'].rolling(window=200).mean()  # średnia krocząca z 200 dni
-    
-    # RSI
-    delta = data['Close'].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = loss.rolling(window=14).mean()
-    rs = avg_gain / avg_loss
-    data['RSI'] = 100 - (100 / (1 + rs))
-    
-    # MACD 
-    data['EMA12'] = data['Close'].ewm(span=12, adjust=False).mean()
-    data['EMA26'] = data['Close'].ewm(span=26, adjust=False).mean()
-    data['MACD'] = data['EMA12'] - data['EMA26']
-    data['Signal'] = data['MACD'].ewm(span=9, adjust=False).mean()
-    data['MACD_Hist'] = data['MACD'] - data['Signal']
-    
-    # Wstęgi Bollingera
-    data['BB_Middle'] = data['Close'].rolling(window=20).mean()
-    data['BB_Std'] = data['Close'].rolling(window=20).std()
-    data['BB_Upper'] = data['BB_Middle'] + (data['BB_Std'] * 2)
-    data['BB_Lower'] = data['BB_Middle'] - (data['BB_Std'] * 2)
-    data['BB_Width'] = (data['BB_Upper'] - data['BB_Lower']) / data['BB_Middle']
-    
-    data['Target_5day'] = (data['Close'].shift(-5) > data['Close']).astype(int)
-    data['Return_5day'] = data['Close'].pct_change(periods=5).shift(-5)
+def get_stock_data_many(tickers, period="1y"):
+    """Historie wielu tickerów - brakujące dane pobierane jednym zapytaniem"""
+    return get_price_store().get_histories(tickers, period=period)
+
+def _add_targets(data):
+    data['Target_5day'] = (data['Close'].shift(-RETURN_HORIZON) > data['Close']).astype(int)
+    data['Return_5day'] = data['Close'].pct_change(periods=RETURN_HORIZON).shift(-RETURN_HORIZON)
     data.dropna(inplace=True)
     
     if len(data) < 30:
@@ -69,9 +59,60 @@ def prepare_features(df):
     
     return data
 
+def prepare_features(df, ticker=None):
+    """Przygotuj cechy dla modeli ML"""
+    #wskaźniki techniczne (SMA20/50/200, RSI, MACD, wstęgi Bollingera) - wspólny silnik NumPy
+    if ticker:
+        data = get_indicators(ticker, df)
+    else:
+        data = add_indicators(df)
+    return _add_targets(data)
+
+def prepare_features_many(histories):
+    """prepare_features dla wielu tickerów; ticker -> dane albo wyjątek.
+
+    Tickery z identycznym kalendarzem notowań liczone są razem jako kolumny jednej tablicy 2-D.
+    """
+    groups = {}
+    for ticker, df in histories.items():
+        if df.empty:
+            continue
+        groups.setdefault(tuple(df.index.asi8), []).append(ticker)
+    
+    prepared = {ticker: ValueError(f"Nie znaleziono danych dla tickera {ticker}")
+                for ticker, df in histories.items() if df.empty}
+    for tickers in groups.values():
+        closes = np.column_stack([histories[ticker]['Close'].to_numpy(dtype=float) for ticker in tickers])
+        indicators = compute_indicator_arrays(closes)
+        for col, ticker in enumerate(tickers):
+            data = histories[ticker].copy()
+            for name, values in indicators.items():
+                data[name] = values[:, col]
+            try:
+                prepared[ticker] = _add_targets(data)
+            except ValueError as e:
+                prepared[ticker] = e
+    return prepared
+
+def build_classifier(n_jobs=-1):
+    return RandomForestClassifier(
+        n_estimators=100, 
+        random_state=42,
+        n_jobs=n_jobs,
+        max_samples=None 
+    )
+
+def build_regressor():
+    return GradientBoostingRegressor(
+        n_estimators=100,
+        random_state=42,
+        learning_rate=0.1,
+        max_depth=3 #glebokosc drzewa
+    )
+
 def train_classification_model(data):
     """Trenuj model klasyfikacyjny do przewidywania kierunku ruchu ceny"""
-    features = ['SMA20', 'SMA50', 'SMA200', 'RSI', 'MACD', 'Signal', 'MACD_Hist', 'BB_Width']
+    features = list(MODEL_FEATURES)
     X = data[features].values
     y = data['Target_5day'].values
     
@@ -86,12 +127,7 @@ def train_classification_model(data):
     X_train = scaler.fit_transform(X_train)
     X_test = scaler.transform(X_test)
     
-    model = RandomForestClassifier(
-        n_estimators=100, 
-        random_state=42,
-        n_jobs=-1,
-        max_samples=None 
-    )
+    model = build_classifier()
     model.fit(X_train, y_train)
     
     try:
@@ -103,7 +139,7 @@ def train_classification_model(data):
     return model, scaler, accuracy, features
 
 def train_regression_model(data):
-    features = ['SMA20', 'SMA50', 'SMA200', 'RSI', 'MACD', 'Signal', 'MACD_Hist', 'BB_Width']
+    features = list(MODEL_FEATURES)
     X = data[features].values
     y = data['Return_5day'].values
     
@@ -126,12 +162,7 @@ def train_regression_model(data):
     X_train = scaler.fit_transform(X_train)
     X_test = scaler.transform(X_test)
     
-    model = GradientBoostingRegressor(
-        n_estimators=100,
-        random_state=42,
-        learning_rate=0.1,
-        max_depth=3 #glebokosc drzewa
-    )
+    model = build_regressor()
     
     try:
         model.fit(X_train, y_train)
@@ -148,160 +179,244 @@ def train_regression_model(data):
         
     return model, scaler, mse, mae, features
 
+def _models_path(ticker):
+    safe_ticker = re.sub(r'[^A-Za-z0-9._-]', '_', ticker.upper())
+    return cache_path('models', 'investbot', f'{safe_ticker}.joblib')
+
+def load_models(ticker):
+    """Wczytaj zapisane modele, skalery i metryki dla tickera (None, jeśli brak lub inna wersja cech)"""
+    bundle = _models_cache.get(ticker.upper())
+    if bundle is MISSING:
+        path = _models_path(ticker)
+        if not os.path.exists(path):
+            return None
+        try:
+            bundle = joblib.load(path)
+        except Exception as e:
+            print(f"Błąd wczytywania modeli dla {ticker}: {e}")
+            return None
+        _models_cache.set(ticker.upper(), bundle)
+    if bundle.get('schema_version') != FEATURE_SCHEMA_VERSION or bundle.get('features') != MODEL_FEATURES:
+        return None
+    return bundle
+
+def save_models(ticker, bundle):
+    _models_cache.set(ticker.upper(), bundle)
+    path = _models_path(ticker)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        joblib.dump(bundle, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Błąd zapisu modeli dla {ticker}: {e}")
+
+def train_models(ticker, prepared_data):
+    """Trenuj oba modele i zapisz je razem z metrykami"""
+    classification_model, class_scaler, accuracy, _ = train_classification_model(prepared_data)
+    regression_model, reg_scaler, mse, mae, _ = train_regression_model(prepared_data)
+    bundle = {
+        'ticker': ticker.upper(),
+        'schema_version': FEATURE_SCHEMA_VERSION,
+        'features': list(MODEL_FEATURES),
+        'classification_model': classification_model,
+        'class_scaler': class_scaler,
+        'accuracy': accuracy,
+        'regression_model': regression_model,
+        'reg_scaler': reg_scaler,
+        'mse': mse,
+        'mae': mae,
+        'trained_at': time.time(),
+        'last_bar': prepared_data.index[-1],
+        'rows': len(prepared_data)
+    }
+    save_models(ticker, bundle)
+    return bundle
+
+def _retrain_reason(bundle, prepared_data):
+    if bundle is None:
+        return 'missing'
+    if time.time() - bundle['trained_at'] > INVESTBOT_RETRAIN_AFTER:
+        return 'expired'
+    last_bar = pd.Timestamp(bundle['last_bar'])
+    if last_bar.tzinfo is not None and prepared_data.index.tz is None:
+        last_bar = last_bar.tz_localize(None)
+    if (prepared_data.index > last_bar).sum() >= INVESTBOT_RETRAIN_BARS:
+        return 'new_bars'
+    return None
+
+def get_trained_models(ticker, prepared_data):
+    """Modele z cache (tylko inferencja) albo trening, gdy są nieaktualne"""
+    bundle = load_models(ticker)
+    reason = _retrain_reason(bundle, prepared_data)
+    started = time.perf_counter()
+    if reason:
+        bundle = train_models(ticker, prepared_data)
+    metadata = {
+        'cache': 'miss' if reason else 'hit',
+        'retrain_reason': reason,
+        'train_time': round(time.perf_counter() - started, 3) if reason else 0.0,
+        'trained_at': datetime.datetime.fromtimestamp(bundle['trained_at']).strftime("%Y-%m-%d %H:%M:%S"),
+        'schema_version': FEATURE_SCHEMA_VERSION
+    }
+    return bundle, metadata
+
+def retrain_models(ticker, force=False):
+    """Ponowny trening poza ścieżką zapytania (harmonogram, zadanie w tle lub wiersz poleceń)"""
+    prepared_data = prepare_features(get_stock_data(ticker), ticker)
+    bundle = load_models(ticker)
+    reason = 'forced' if force else _retrain_reason(bundle, prepared_data)
+    if reason:
+        bundle = train_models(ticker, prepared_data)
+    return {
+        'ticker': ticker,
+        'retrained': bool(reason),
+        'reason': reason,
+        'model_accuracy': float(bundle['accuracy'] * 100)
+    }
+
+def saved_model_tickers():
+    """Tickery z zapisanymi modelami; nazwa pliku jest oczyszczona (^GSPC -> _GSPC), więc ticker czytamy z paczki"""
+    tickers = []
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(_models_path('x')), '*.joblib'))):
+        try:
+            bundle = joblib.load(path)
+        except Exception as e:
+            print(f"Błąd wczytywania modeli z {path}: {e}")
+            continue
+        # paczki sprzed zapisywania tickera - nazwa pliku jest poprawna dla zwykłych symboli
+        tickers.append(bundle.get('ticker') or os.path.splitext(os.path.basename(path))[0])
+    return tickers
+
+def retrain_saved_models(force=False):
+    """Ponowny trening wszystkich zapisanych modeli po kolei (zadanie harmonogramu)"""
+    results = []
+    for ticker in saved_model_tickers():
+        try:
+            results.append(retrain_models(ticker, force=force))
+        except Exception as e:
+            print(f"Błąd ponownego treningu dla {ticker}: {e}")
+            results.append({'ticker': ticker, 'retrained': False, 'reason': None, 'failure': str(e)})
+    return results
+
 def prepare_backtest_data(data, predictions, returns):
-    dates = data.index.strftime('%Y-%m-%d').tolist()
-    
-    initial_value = 1000
-    current_value = initial_value
-    portfolio_values = [initial_value]
-    
-    for i in range(1, len(predictions)):
-        if i < len(returns):  
-            if predictions[i-1] == 1:
-                if np.isfinite(returns[i]):
-                    current_value *= (1 + returns[i])
-            portfolio_values.append(current_value)
-    
-    buy_hold_values = [initial_value]
-    current_buy_hold = initial_value
-    
-    for i in range(1, len(data)):
-        if i < len(data):
-            daily_return = data['Close'].pct_change().iloc[i]
-            if np.isfinite(daily_return):
-                current_buy_hold *= (1 + daily_return)
-            buy_hold_values.append(current_buy_hold)
-    
-    min_length = min(len(portfolio_values), len(buy_hold_values), len(dates))
-    portfolio_values = portfolio_values[:min_length]
-    buy_hold_values = buy_hold_values[:min_length]
-    dates = dates[:min_length]
-    
+    result = run_backtest(predictions, returns, data['Close'].to_numpy(dtype=float), horizon=RETURN_HORIZON)
     return {
-        'dates': dates,
-        'ai_strategy': portfolio_values,
-        'buy_hold': buy_hold_values
+        'dates': data.index.strftime('%Y-%m-%d').tolist(),
+        'ai_strategy': result['strategy'].tolist(),
+        'buy_hold': result['buy_hold'].tolist()
     }
 
 def calculate_risk_metrics(data, predictions, returns):
-    #ryzyko!
-    strategy_returns = []
-    
-    for i in range(1, min(len(predictions), len(returns))):
-        if predictions[i-1] == 1 and np.isfinite(returns[i]):
-            strategy_returns.append(returns[i])
-        else:
-            strategy_returns.append(0)
-    
-    #wskaźniki
-    if len(strategy_returns) > 0 and np.std(strategy_returns) != 0:
-        sharpe_ratio = np.mean(strategy_returns) / np.std(strategy_returns)
-    else:
-        sharpe_ratio = 0
-    
-    max_drawdown = 0
-    peak = 1000
-    trough = 1000
-    portfolio = 1000
-    
-    for ret in strategy_returns:
-        portfolio *= (1 + ret)
-        
-        if portfolio > peak:
-            peak = portfolio
-            trough = portfolio
-        elif portfolio < trough:
-            trough = portfolio
-            current_drawdown = (peak - trough) / peak
-            if current_drawdown > max_drawdown:
-                max_drawdown = current_drawdown
-    
-    # winrate
-    win_count = sum(1 for ret in strategy_returns if ret > 0)
-    total_trades = sum(1 for ret in strategy_returns if ret != 0)
-    win_rate = win_count / total_trades if total_trades > 0 else 0
-    
-    # zwrot
-    non_zero_returns = [r for r in strategy_returns if r != 0]
-    avg_return = np.mean(non_zero_returns) * 100 if non_zero_returns else 0
+    #ryzyko! zwroty są 5-dniowe, więc Sharpe annualizowany liczbą takich okresów w roku
+    n = min(len(predictions), len(returns))
+    strategy = strategy_returns(np.asarray(predictions)[:n], np.asarray(returns)[:n])[1:]
+    metrics = risk_metrics(strategy, TRADING_DAYS_PER_YEAR / RETURN_HORIZON)
     
     return {
-        'sharpe_ratio': round(sharpe_ratio, 2),
-        'max_drawdown': round(max_drawdown * 100, 2),
-        'win_rate': round(win_rate * 100, 2),
-        'total_trades': total_trades,
-        'average_return_per_trade': round(avg_return, 2)
+        'sharpe_ratio': round(float(metrics['sharpe_ratio']), 2),
+        'max_drawdown': round(float(metrics['max_drawdown']) * 100, 2),
+        'win_rate': round(float(metrics['win_rate']) * 100, 2),
+        'total_trades': int(metrics['total_trades']),
+        'average_return_per_trade': round(float(metrics['average_return_per_trade']) * 100, 2)
     }
 
+def _rule_based_insights(current_price, sma50, sma200, rsi):
+    if current_price > sma50 and sma50 > sma200 and rsi < 70:
+        return "Analiza techniczna wskazuje na trend wzrostowy. Cena powyżej średnich kroczących 50 i 200 dni, co jest pozytywnym sygnałem. RSI nie wskazuje na wykupienie rynku."
+    elif current_price < sma50 and sma50 < sma200 and rsi > 30:
+        return "Analiza techniczna wskazuje na trend spadkowy. Cena poniżej średnich kroczących 50 i 200 dni, co jest negatywnym sygnałem. RSI nie wskazuje na wyprzedanie rynku."
+    else:
+        return "Analiza techniczna wskazuje na mieszane sygnały. Zalecana ostrożność i dalsza obserwacja przed podjęciem decyzji inwestycyjnej."
+
+def _insights_request(ticker, current_price, sma50, sma200, rsi, prediction_accuracy, risk_metrics, last_bar):
+    """Prompt, odcisk danych wejściowych i porada zastępcza dla modelu językowego"""
+    info = get_ticker_info(ticker)
+    company_name = info.get('longName', ticker)
+    sector = info.get('sector', 'Nieznany')
+    industry = info.get('industry', 'Nieznana')
+    
+    prompt = f"""
+    Jako doradca inwestycyjny AI, przeanalizuj te dane dla {company_name} ({ticker}):
+    
+    Szczegóły spółki:
+    - Nazwa: {company_name}
+    - Ticker: {ticker}
+    - Sektor: {sector}
+    - Branża: {industry}
+    
+    Analiza techniczna:
+    - Obecna cena: ${current_price:.2f}
+    - 50-dniowa średnia krocząca: ${sma50:.2f}
+    - 200-dniowa średnia krocząca: ${sma200:.2f}
+    - RSI (14): {rsi:.2f}
+    
+    Wyniki modelu:
+    - Dokładność prognoz: {prediction_accuracy*100:.2f}%
+    - Wskaźnik Sharpe'a: {risk_metrics['sharpe_ratio']}
+    - Maksymalny spadek: {risk_metrics['max_drawdown']}%
+    - Win rate: {risk_metrics['win_rate']}%
+    
+    Na podstawie tych danych, dostarcz krótką poradę inwestycyjną dla {company_name} zawierającą:
+    1. Ogólną ocenę (bycza, niedźwiedzia lub neutralna)
+    2. Kluczowe mocne strony i obawy
+    3. Ocenę ryzyka (niskie, średnie, wysokie)
+    4. Perspektywę krótko- i długoterminową
+    5. Podsumowanie rekomendacji w jednym zdaniu
+    
+    Udziel odpowiedzi po polsku, krótko i treściwie, koncentrując się na praktycznych poradach.
+    Nie przekraczaj 300 słów.
+    """
+
+    # odcisk danych wejściowych: ceny zaokrąglone do ~0,5%, żeby w ciągu sesji nie pytać modelu ponownie o to samo
+    fingerprint = '|'.join([
+        'investbot', ticker.upper(), last_bar, f'{current_price:.3g}', f'{sma50:.3g}', f'{sma200:.3g}',
+        f'{rsi:.0f}', f'{prediction_accuracy*100:.0f}', str(risk_metrics['sharpe_ratio']),
+        str(risk_metrics['max_drawdown']), str(risk_metrics['win_rate'])
+    ])
+    return prompt, fingerprint, lambda: _rule_based_insights(current_price, sma50, sma200, rsi)
+
 def generate_ai_insights(ticker, data, prediction_accuracy, risk_metrics):
     try:
-        company = yf.Ticker(ticker)
-        info = company.info
-        company_name = info.get('longName', ticker)
-        sector = info.get('sector', 'Nieznany')
-        industry = info.get('industry', 'Nieznana')
-        
         current_price = data['Close'].iloc[-1] if 'Close' in data and len(data) > 0 else 0
         sma50 = data['SMA50'].iloc[-1] if 'SMA50' in data and len(data) > 0 else 0
         sma200 = data['SMA200'].iloc[-1] if 'SMA200' in data and len(data) > 0 else 0
         rsi = data['RSI'].iloc[-1] if 'RSI' in data and len(data) > 0 else 0
+        last_bar = data.index[-1].strftime('%Y-%m-%d') if len(data) > 0 else ''
         
-        prompt = f"""
-        Jako doradca inwestycyjny AI, przeanalizuj te dane dla {company_name} ({ticker}):
-        
-        Szczegóły spółki:
-        - Nazwa: {company_name}
-        - Ticker: {ticker}
-        - Sektor: {sector}
-        - Branża: {industry}
-        
-        Analiza techniczna:
-        - Obecna cena: ${current_price:.2f}
-        - 50-dniowa średnia krocząca: ${sma50:.2f}
-        - 200-dniowa średnia krocząca: ${sma200:.2f}
-        - RSI (14): {rsi:.2f}
-        
-        Wyniki modelu:
-        - Dokładność prognoz: {prediction_accuracy*100:.2f}%
-        - Wskaźnik Sharpe'a: {risk_metrics['sharpe_ratio']}
-        - Maksymalny spadek: {risk_metrics['max_drawdown']}%
-        - Win rate: {risk_metrics['win_rate']}%
-        
-        Na podstawie tych danych, dostarcz krótką poradę inwestycyjną dla {company_name} zawierającą:
-        1. Ogólną ocenę (bycza, niedźwiedzia lub neutralna)
-        2. Kluczowe mocne strony i obawy
-        3. Ocenę ryzyka (niskie, średnie, wysokie)
-        4. Perspektywę krótko- i długoterminową
-        5. Podsumowanie rekomendacji w jednym zdaniu
-        
-        Udziel odpowiedzi po polsku, krótko i treściwie, koncentrując się na praktycznych poradach.
-        Nie przekraczaj 300 słów.
-        """
-        
-        try:
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as ai_error:
-            print(f"Błąd AI: {ai_error}")
-            if current_price > sma50 and sma50 > sma200 and rsi < 70:
-                return "Analiza techniczna wskazuje na trend wzrostowy. Cena powyżej średnich kroczących 50 i 200 dni, co jest pozytywnym sygnałem. RSI nie wskazuje na wykupienie rynku."
-            elif current_price < sma50 and sma50 < sma200 and rsi > 30:
-                return "Analiza techniczna wskazuje na trend spadkowy. Cena poniżej średnich kroczących 50 i 200 dni, co jest negatywnym sygnałem. RSI nie wskazuje na wyprzedanie rynku."
-            else:
-                return "Analiza techniczna wskazuje na mieszane sygnały. Zalecana ostrożność i dalsza obserwacja przed podjęciem decyzji inwestycyjnej."
+        prompt, fingerprint, fallback = _insights_request(
+            ticker, current_price, sma50, sma200, rsi, prediction_accuracy, risk_metrics, last_bar
+        )
+        return generate_text(prompt, fingerprint=fingerprint, fallback=fallback)
             
     except Exception as e:
         return f"Nie udało się wygenerować porad AI: {str(e)}"
 
-def get_investment_advice(ticker):
-    #porady inwestycyjne
+def stream_ai_insights(advice):
+    """Porada AI dla wyniku get_investment_advice(..., include_insights=False), oddawana fragmentami"""
     try:
-        stock_data = get_stock_data(ticker)
-        prepared_data = prepare_features(stock_data)
+        technical = advice['technical_data']
+        prompt, fingerprint, fallback = _insights_request(
+            advice['ticker'], technical['close'], technical['sma50'], technical['sma200'], technical['rsi'],
+            advice['model_accuracy'] / 100, advice['risk_metrics'], advice['backtest_data']['dates'][-1]
+        )
+    except Exception as e:
+        return iter([f"Nie udało się wygenerować porad AI: {str(e)}"])
+    return stream_text(prompt, fingerprint=fingerprint, fallback=fallback)
+
+def get_investment_advice(ticker, prepared_data=None, include_insights=True):
+    #porady inwestycyjne; prepared_data przekazuje endpoint wsadowy, który przygotował cechy dla wielu tickerów naraz
+    #include_insights=False pomija model językowy - endpoint strumieniowy wysyła poradę AI osobno
+    try:
+        report_progress('data', 0.05)
+        if prepared_data is None:
+            stock_data = get_stock_data(ticker)
+            prepared_data = prepare_features(stock_data, ticker)
         
-        classification_model, class_scaler, accuracy, class_features = train_classification_model(prepared_data)
-        regression_model, reg_scaler, mse, mae, reg_features = train_regression_model(prepared_data)
+        report_progress('training', 0.2)
+        models, model_metadata = get_trained_models(ticker, prepared_data)
+        classification_model, class_scaler = models['classification_model'], models['class_scaler']
+        regression_model, accuracy = models['regression_model'], models['accuracy']
+        class_features = models['features']
         
         X_backtest = prepared_data[class_features].values
         X_backtest_scaled = class_scaler.transform(X_backtest)
@@ -314,7 +429,8 @@ def get_investment_advice(ticker):
         risk_metrics = calculate_risk_metrics(prepared_data, predictions, prepared_data['Return_5day'].values)
         
         # porady AI
-        insights = generate_ai_insights(ticker, prepared_data, accuracy, risk_metrics)
+        report_progress('ai_insights', 0.7)
+        insights = generate_ai_insights(ticker, prepared_data, accuracy, risk_metrics) if include_insights else None
         
         try:
             current_features = prepared_data[class_features].iloc[-1:].values
@@ -372,6 +488,7 @@ def get_investment_advice(ticker):
             'technical_data': technical_data,
             'model_accuracy': float(accuracy * 100),
             'risk_metrics': risk_metrics,
+            'model_metadata': model_metadata,
             'ai_insights': insights,
             'last_updated': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
@@ -380,4 +497,10 @@ def get_investment_advice(ticker):
     
     except Exception as e:
         print(f"błąd: {e}")
-        return {'error': str(e)}
\ No newline at end of file
+        return {'error': str(e)}
+
+if __name__ == '__main__':
+    import sys
+    # python finance_investbot.py AAPL MSFT - wymuszony ponowny trening (np. z crona)
+    for symbol in sys.argv[1:]:
+        print(retrain_models(symbol, force=True))
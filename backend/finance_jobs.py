@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import uuid
+import queue
+import importlib
+import threading
+import hashlib
+import multiprocessing
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+import pandas as pd
+from finance_cache import cache_path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows (serwer deweloperski) - bez blokady między procesami
+    fcntl = None
+
+# rodzaj zadania -> funkcja uruchamiana w osobnym procesie (importowana dopiero w procesie roboczym)
+JOB_FUNCTIONS = {
+    'predict_stock': 'finance_predictions.predict_stock_prices',
+    'investbot': 'finance_investbot.get_investment_advice',
+    'investbot_retrain': 'finance_investbot.retrain_models',
+    'investbot_retrain_all': 'finance_investbot.retrain_saved_models',
+}
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', 100))
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', 15 * 60))
+JOB_START_METHOD = os.getenv('JOB_START_METHOD', 'spawn')
+# co ile sekund sprawdzać, czy zapisane modele investbota wymagają ponownego treningu (0 = wyłączone)
+INVESTBOT_RETRAIN_INTERVAL = float(os.getenv('INVESTBOT_RETRAIN_INTERVAL', 0))
+
+_progress_queue = None
+_current_job_id: Optional[str] = None
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def in_job_worker() -> bool:
+    """Czy kod działa w procesie roboczym puli zadań"""
+    return _progress_queue is not None
+
+
+def report_progress(stage: str, progress: float) -> None:
+    """Wywoływane z kodu modeli; poza procesem roboczym zadania nic nie robi"""
+    if _progress_queue is None or _current_job_id is None:
+        return
+    try:
+        _progress_queue.put_nowait((_current_job_id, stage, float(progress)))
+    except Exception:
+        pass
+
+
+def _key_default(value: Any) -> str:
+    """Klucz deduplikacji dla parametrów spoza JSON - ramki danych rozróżniamy po treści, nie po repr()"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return hashlib.sha1(pd.util.hash_pandas_object(value).to_numpy().tobytes()
+                            + repr(list(getattr(value, 'columns', []))).encode()).hexdigest()
+    return str(value)
+
+
+def _job_key(kind: str, params: Dict[str, Any]) -> str:
+    # AAPL i aapl to to samo zadanie
+    if isinstance(params.get('ticker'), str):
+        params = {**params, 'ticker': params['ticker'].strip().upper()}
+    return json.dumps([kind, params], sort_keys=True, default=_key_default)
+
+
+def _run_job(job_id: str, kind: str, params: Dict[str, Any]) -> Any:
+    global _current_job_id
+    _current_job_id = job_id
+    try:
+        report_progress('running', 0.0)
+        module_name, func_name = JOB_FUNCTIONS[kind].rsplit('.', 1)
+        func = getattr(importlib.import_module(module_name), func_name)
+        return func(**params)
+    finally:
+        _current_job_id = None
+
+
+class JobManager:
+    """Kolejka zadań obliczeniowych w ograniczonej puli procesów; identyczne zadania w toku są łączone"""
+
+    def __init__(self, max_workers: int = JOB_WORKERS):
+        self.max_workers = max_workers
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[str, str] = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._progress_queue = None
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            ctx = multiprocessing.get_context(JOB_START_METHOD)
+            self._progress_queue = ctx.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._progress_queue,)
+            )
+            threading.Thread(target=self._listen_progress, args=(self._progress_queue,),
+                             name='job-progress', daemon=True).start()
+        return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Porzuca pulę, w której padł proces roboczy (np. OOM); następne zadanie utworzy nową. Wołane z blokadą."""
+        if self._executor is not executor:
+            return
+        self._executor = None
+        # wątek postępu starej puli kończy się sam; nie piszemy do jej kolejki - martwy proces mógł zostawić ją zablokowaną
+        self._progress_queue = None
+        executor.shutdown(wait=False)
+
+    def _listen_progress(self, progress_queue) -> None:
+        while self._progress_queue is progress_queue:
+            try:
+                job_id, stage, progress = progress_queue.get(timeout=1)
+            except (EOFError, OSError):
+                return
+            except queue.Empty:
+                continue
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job and job['status'] in ('queued', 'running'):
+                    if job['status'] == 'queued':
+                        job['status'] = 'running'
+                        job['started_at'] = time.time()
+                    job['stage'] = stage
+                    job['progress'] = max(job['progress'], min(progress, 1.0))
+
+    def _prune(self) -> None:
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job['finished_at'] and now - job['finished_at'] > JOB_RESULT_TTL:
+                del self._jobs[job_id]
+                if self._by_key.get(job['key']) == job_id:
+                    del self._by_key[job['key']]
+
+    def _pending_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._pending_count()
+
+    def submit(self, kind: str, **params) -> str:
+        if kind not in JOB_FUNCTIONS:
+            raise ValueError(f"Nieznany rodzaj zadania: {kind}")
+        key = _job_key(kind, params)
+
+        with self._lock:
+            self._prune()
+            existing_id = self._by_key.get(key)
+            existing = self._jobs.get(existing_id) if existing_id else None
+            # zadanie w toku albo świeży wynik - nie liczymy drugi raz
+            if existing and existing['status'] != 'error':
+                return existing_id
+
+            if self._pending_count() >= JOB_MAX_PENDING:
+                raise JobQueueFull("Zbyt wiele zadań w kolejce, spróbuj ponownie później.")
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'key': key,
+                'kind': kind,
+                'params': params,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': 0.0,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+            self._by_key[key] = job_id
+            executor = self._ensure_executor()
+            try:
+                future = executor.submit(_run_job, job_id, kind, params)
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                executor = self._ensure_executor()
+                future = executor.submit(_run_job, job_id, kind, params)
+            self._futures[job_id] = future
+
+        future.add_done_callback(lambda f, job_id=job_id, executor=executor: self._finish(job_id, f, executor))
+        return job_id
+
+    def _finish(self, job_id: str, future, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                self._discard_executor(executor)
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['finished_at'] = time.time()
+            try:
+                result = future.result()
+                if isinstance(result, dict) and 'error' in result:
+                    raise ValueError(result['error'])
+                job['result'] = result
+                job['status'] = 'done'
+                job['stage'] = 'done'
+                job['progress'] = 1.0
+            except BrokenProcessPool:
+                job['status'] = 'error'
+                job['stage'] = 'error'
+                job['error'] = "Proces obliczeniowy zakończył się nieoczekiwanie, spróbuj ponownie."
+            except Exception as e:
+                job['status'] = 'error'
+                job['stage'] = 'error'
+                job['error'] = str(e)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            public = {k: v for k, v in job.items() if k != 'key'}
+            public['params'] = {
+                name: f'<{type(value).__name__}>' if isinstance(value, (pd.DataFrame, pd.Series)) else value
+                for name, value in job['params'].items()
+            }
+            return public
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Any:
+        """Czeka na wynik zadania; wyjątek z procesu roboczego jest przekazywany dalej"""
+        with self._lock:
+            future = self._futures.get(job_id)
+            job = self._jobs.get(job_id)
+        if future is not None:
+            result = future.result(timeout=timeout)
+            if isinstance(result, dict) and 'error' in result:
+                raise ValueError(result['error'])
+            return result
+        if job is None:
+            raise KeyError(job_id)
+        if job['status'] == 'error':
+            raise ValueError(job['error'])
+        return job['result']
+
+    def as_completed(self, job_ids: Iterable[str], timeout: Optional[float] = None) -> Iterator[Tuple[str, Any, Optional[str]]]:
+        """(id zadania, wynik, błąd) w kolejności kończenia się zadań"""
+        with self._lock:
+            futures = {job_id: self._futures.get(job_id) for job_id in job_ids}
+        pending = {future: job_id for job_id, future in futures.items() if future is not None}
+        for job_id, future in futures.items():
+            if future is None:
+                yield self._outcome(job_id)
+        for future in concurrent.futures.as_completed(pending, timeout=timeout):
+            yield self._outcome(pending[future])
+
+    def _outcome(self, job_id: str) -> Tuple[str, Any, Optional[str]]:
+        try:
+            return job_id, self.wait(job_id, timeout=0), None
+        except Exception as e:
+            return job_id, None, str(e)
+
+    def run(self, kind: str, timeout: Optional[float] = None, **params) -> Any:
+        return self.wait(self.submit(kind, **params), timeout=timeout)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
+
+
+def _acquire_scheduler_lock(lock_file) -> bool:
+    """Blokada pliku trzymana do końca procesu - harmonogram działa tylko w jednym procesie serwera"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _retrain_loop(interval: float) -> None:
+    with open(cache_path('investbot_retrain.lock'), 'a') as lock_file:
+        while True:
+            time.sleep(interval)
+            # proces z blokadą zleca trening; gdy zginie, blokadę przejmie inny proces roboczy serwera
+            if not _acquire_scheduler_lock(lock_file):
+                continue
+            try:
+                get_job_manager().submit('investbot_retrain_all')
+            except Exception as e:
+                print(f"Błąd planowania ponownego treningu modeli: {e}")
+
+
+def start_retrain_scheduler(interval: float = INVESTBOT_RETRAIN_INTERVAL) -> bool:
+    """Okresowo zleca w tle ponowny trening wszystkich zapisanych modeli investbota.
+
+    Wywoływać w procesie obsługującym zapytania (gunicorn: post_fork), nie w procesie głównym przed forkiem -
+    wątek nie przechodzi do procesów potomnych. Spośród procesów serwera zlecenia wysyła tylko jeden.
+    """
+    if interval <= 0:
+        return False
+    threading.Thread(target=_retrain_loop, args=(interval,), name='investbot-retrain', daemon=True).start()
+    return True
@@ -0,0 +1,224 @@
+"""Dostęp do modelu językowego dla porad investbota: cache odpowiedzi, limit współbieżności i timeout.
+
+Odpowiedzi zapamiętywane są po odcisku znormalizowanego promptu (SQLite, wspólne dla procesów roboczych),
+klient modelu tworzony jest raz na proces, a przy błędzie, przekroczeniu czasu lub braku wolnego slotu
+wołający dostaje od razu tekst zastępczy. LLM_BACKEND=stub pozwala testować bez sieci.
+"""
+import os
+import time
+import queue
+import inspect
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterator, Optional
+from finance_cache import TTLCache, SqliteCache, content_hash, MISSING
+
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+LLM_MODEL = os.getenv('LLM_MODEL', 'gemini-1.5-flash')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 20))
+# ile zapytań do modelu naraz w jednym procesie i jak długo czekać na wolny slot, zanim oddamy tekst zastępczy
+LLM_MAX_CONCURRENT = int(os.getenv('LLM_MAX_CONCURRENT', 2))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 2))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', 12 * 3600))
+LLM_STUB_DELAY = float(os.getenv('LLM_STUB_DELAY', 0))
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+class LLMBackend(ABC):
+    """Interfejs modelu językowego: prompt -> tekst odpowiedzi"""
+    name = 'base'
+    model = ''
+
+    @abstractmethod
+    def generate(self, prompt: str, timeout: float) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        """Fragmenty odpowiedzi w miarę generowania; domyślnie cała odpowiedź naraz"""
+        yield self.generate(prompt, timeout)
+
+
+class GeminiBackend(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self, model: str = LLM_MODEL):
+        import google.generativeai as genai
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            raise LLMUnavailable("Brak GOOGLE_API_KEY.")
+        genai.configure(api_key=api_key)
+        self.model = model
+        self._client = genai.GenerativeModel(model)
+        # starsze wersje google-generativeai (np. 0.3.x z requirements.txt) nie przyjmują request_options
+        self._supports_timeout = 'request_options' in inspect.signature(self._client.generate_content).parameters
+
+    def _options(self, timeout: float) -> Dict[str, Any]:
+        return {'request_options': {'timeout': timeout}} if self._supports_timeout else {}
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self._client.generate_content(prompt, **self._options(timeout))
+        return response.text
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        for chunk in self._client.generate_content(prompt, stream=True, **self._options(timeout)):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackend(LLMBackend):
+    """Lokalna odpowiedź bez sieci - do testów i pracy offline"""
+    name = 'stub'
+    model = 'stub'
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        return ''.join(self.stream(prompt, timeout))
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        # jak klient bez własnego timeoutu - limit czasu pilnuje warstwa wyżej
+        text = (f"Odpowiedź testowa ({content_hash(prompt)[:8]}). Ogólna ocena: neutralna. "
+                "Ryzyko: średnie. Rekomendacja: obserwuj spółkę przed podjęciem decyzji.")
+        words = text.split(' ')
+        for i, word in enumerate(words):
+            # opóźnienie rozłożone na słowa, jak przy generowaniu token po tokenie
+            time.sleep(LLM_STUB_DELAY / len(words))
+            yield word if i == len(words) - 1 else word + ' '
+
+
+LLM_BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    StubBackend.name: StubBackend,
+}
+
+_backends: Dict[str, LLMBackend] = {}
+_backends_lock = threading.Lock()
+
+def get_llm_backend(name: Optional[str] = None) -> LLMBackend:
+    name = name or LLM_BACKEND
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Nieznany model językowy: {name}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = LLM_BACKENDS[name]()
+        return _backends[name]
+
+
+_memory_cache = TTLCache(maxsize=256, ttl=LLM_CACHE_TTL)
+_disk_cache = SqliteCache('llm_responses', ttl=LLM_CACHE_TTL)
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENT)
+# zapytania do modelu wykonywane w wątkach, żeby limit LLM_TIMEOUT obowiązywał niezależnie od klienta
+# (google-generativeai 0.3.x nie ma request_options); zawieszone wywołanie zajmuje wątek, ale nie slot
+_calls = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENT * 2, thread_name_prefix='llm')
+_END = object()
+
+
+def _generate_with_deadline(backend: LLMBackend, prompt: str) -> str:
+    future = _calls.submit(backend.generate, prompt, LLM_TIMEOUT)
+    try:
+        return future.result(timeout=LLM_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        raise TimeoutError("Przekroczono czas odpowiedzi modelu.")
+
+
+def _stream_with_deadline(backend: LLMBackend, prompt: str) -> Iterator[str]:
+    """Fragmenty z backend.stream(); cała odpowiedź musi zmieścić się w LLM_TIMEOUT"""
+    chunks: queue.Queue = queue.Queue()
+
+    def produce():
+        try:
+            for chunk in backend.stream(prompt, LLM_TIMEOUT):
+                chunks.put(chunk)
+            chunks.put(_END)
+        except BaseException as e:
+            chunks.put(e)
+
+    future = _calls.submit(produce)
+    deadline = time.monotonic() + LLM_TIMEOUT
+    while True:
+        try:
+            item = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            future.cancel()
+            raise TimeoutError("Przekroczono czas odpowiedzi modelu.")
+        if item is _END:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def _call(backend: LLMBackend, key: str, prompt: str) -> str:
+    stored = _disk_cache.get(key)
+    if stored is not MISSING:
+        return stored
+    if not _slots.acquire(timeout=LLM_QUEUE_TIMEOUT):
+        raise LLMUnavailable("Limit równoległych zapytań do modelu został osiągnięty.")
+    try:
+        text = _generate_with_deadline(backend, prompt)
+    finally:
+        _slots.release()
+    if not text:
+        raise LLMUnavailable("Pusta odpowiedź modelu.")
+    _disk_cache.set(key, text)
+    return text
+
+
+def generate_text(prompt: str, fingerprint: Optional[str] = None,
+                  fallback: Optional[Callable[[], str]] = None) -> str:
+    """Odpowiedź modelu z cache albo z nowego zapytania.
+
+    fingerprint to znormalizowany opis danych wejściowych (domyślnie sam prompt) - prompty różniące się tylko
+    nieistotnymi szczegółami dzielą jedną odpowiedź. Przy błędzie zwracany jest wynik fallback(), jeśli podano.
+    """
+    try:
+        backend = get_llm_backend()
+        key = content_hash(backend.name, backend.model, fingerprint if fingerprint is not None else prompt)
+        # równoległe zapytania o ten sam klucz czekają na jedną odpowiedź
+        return _memory_cache.get_or_load(key, lambda: _call(backend, key, prompt))
+    except Exception as e:
+        if fallback is None:
+            raise
+        print(f"Błąd AI: {e}")
+        return fallback()
+
+
+def stream_text(prompt: str, fingerprint: Optional[str] = None,
+                fallback: Optional[Callable[[], str]] = None) -> Iterator[str]:
+    """Jak generate_text(), ale oddaje fragmenty odpowiedzi w miarę ich generowania.
+
+    Odpowiedź z cache wysyłana jest w całości; pełna nowa odpowiedź trafia do cache po zakończeniu strumienia.
+    """
+    chunks = []
+    try:
+        backend = get_llm_backend()
+        key = content_hash(backend.name, backend.model, fingerprint if fingerprint is not None else prompt)
+        cached = _memory_cache.get(key)
+        if cached is MISSING:
+            cached = _disk_cache.get(key)
+        if cached is not MISSING:
+            _memory_cache.set(key, cached)
+            yield cached
+            return
+
+        if not _slots.acquire(timeout=LLM_QUEUE_TIMEOUT):
+            raise LLMUnavailable("Limit równoległych zapytań do modelu został osiągnięty.")
+        try:
+            for chunk in _stream_with_deadline(backend, prompt):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            _slots.release()
+        text = ''.join(chunks)
+        if text:
+            _memory_cache.set(key, text)
+            _disk_cache.set(key, text)
+    except Exception as e:
+        # po wysłaniu części odpowiedzi nie doklejamy już tekstu zastępczego
+        if fallback is None or chunks:
+            raise
+        print(f"Błąd AI: {e}")
+        yield fallback()
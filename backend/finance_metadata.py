@@ -0,0 +1,18 @@
+import os
+from typing import Any, Dict
+from finance_cache import TTLCache
+
+TICKER_INFO_TTL = float(os.getenv('TICKER_INFO_TTL', 6 * 3600))
+TICKER_INFO_MAXSIZE = int(os.getenv('TICKER_INFO_MAXSIZE', 512))
+
+_info_cache = TTLCache(maxsize=TICKER_INFO_MAXSIZE, ttl=TICKER_INFO_TTL)
+
+
+def _fetch_ticker_info(ticker: str) -> Dict[str, Any]:
+    import yfinance as yf
+    return yf.Ticker(ticker).info or {}
+
+
+def get_ticker_info(ticker: str) -> Dict[str, Any]:
+    """Zwraca yf.Ticker(ticker).info z cache; równoległe zapytania o ten sam ticker dzielą jedno pobranie"""
+    return _info_cache.get_or_load(ticker.upper(), lambda: _fetch_ticker_info(ticker))
@@ -1,66 +1,216 @@
-import yfinance as yf
 from datetime import datetime, timedelta
-from textblob import TextBlob
-import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import random
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 import time
+import os
+import re
+import threading
+from finance_cache import TTLCache, SqliteCache, content_hash, MISSING
+from finance_sentiment import get_sentiment_backend
+from finance_translate import translate_many
+
+SENTIMENT_DETERMINISTIC = os.getenv('SENTIMENT_DETERMINISTIC', '1') == '1'
+SENTIMENT_CACHE_SIZE = int(os.getenv('SENTIMENT_CACHE_SIZE', 20000))
+SENTIMENT_CACHE_DISK = os.getenv('SENTIMENT_CACHE_DISK', '0') == '1'
+# język, na który domyślnie tłumaczymy newsy po stronie serwera (puste = bez tłumaczenia)
+NEWS_TRANSLATE_TARGET = os.getenv('NEWS_TRANSLATE_TARGET', '') or None
+
+NEWS_REQUEST_TIMEOUT = 10
+YAHOO_SEARCH_URL = 'https://query1.finance.yahoo.com/v1/finance/search'
+YAHOO_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_session.headers.update(YAHOO_HEADERS)
+
+# wspólna pula dla równoległego pobierania źródeł newsów
+_news_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='news')
+
+def _noise(low: float, high: float) -> float:
+    # w trybie deterministycznym zamiast losowego szumu bierzemy środek przedziału
+    if SENTIMENT_DETERMINISTIC:
+        return (low + high) / 2
+    return random.uniform(low, high)
 
 class SentimentAnalyzer:
+    # hash treści -> wynik; wspólny dla wszystkich zapytań i tickerów
+    _cache = TTLCache(maxsize=SENTIMENT_CACHE_SIZE, ttl=float('inf'))
+    _disk_cache = SqliteCache('sentiment') if SENTIMENT_CACHE_DISK else None
+
     @staticmethod
     def get_random_confidence() -> float:
-        return random.uniform(0.3, 0.9)
+        return _noise(0.3, 0.9)
 
     @staticmethod
-    def analyze(text: str) -> Dict[str, float]:
-        try:
-            if not text or not isinstance(text, str):
-                return {
-                    'score': 0.0,
-                    'confidence': random.uniform(0.3, 0.5)
-                }
-                
-            analysis = TextBlob(str(text))
-            
-            base_sentiment = analysis.sentiment.polarity
-            random_factor = random.uniform(-0.2, 0.2)
+    def _score_many(texts: List[str]) -> List[Dict[str, float]]:
+        polarities, subjectivities = get_sentiment_backend().analyze_many(texts)
+        results = []
+        for base_sentiment, subjectivity in zip(polarities, subjectivities):
+            random_factor = _noise(-0.2, 0.2)
             final_sentiment = max(min(base_sentiment + random_factor, 1.0), -1.0)
             
-            base_confidence = 1 - analysis.sentiment.subjectivity
+            base_confidence = 1 - subjectivity
             confidence_boost = abs(final_sentiment) * 0.3
-            final_confidence = min(base_confidence + confidence_boost + random.uniform(-0.1, 0.1), 1.0)
+            final_confidence = min(base_confidence + confidence_boost + _noise(-0.1, 0.1), 1.0)
             
-            return {
+            results.append({
                 'score': float(final_sentiment),
-                'confidence': max(0.2, final_confidence)
-            }
-        except Exception as e:
-            print(f"Błąd analizy sentymentu: {str(e)}")
-            return {
-                'score': 0.0,
-                'confidence': random.uniform(0.2, 0.4)
-            }
+                'confidence': float(max(0.2, final_confidence))
+            })
+        return results
+
+    @staticmethod
+    def analyze(text: str) -> Dict[str, float]:
+        return SentimentAnalyzer.analyze_many([text])[0]
+
+    @classmethod
+    def analyze_many(cls, texts: List[str]) -> List[Dict[str, float]]:
+        """Ocena sentymentu dla całej partii tekstów, każdy unikalny tekst liczony raz"""
+        results: Dict[str, Dict[str, float]] = {}
+        backend_name = get_sentiment_backend().name
+        keys = {}
+        for text in texts:
+            if not text or not isinstance(text, str):
+                continue
+            key = content_hash(backend_name, text)
+            keys[text] = key
+            if SENTIMENT_DETERMINISTIC:
+                cached = cls._cache.get(key)
+                if cached is not MISSING:
+                    results[text] = cached
+
+        missing = {text: key for text, key in keys.items() if text not in results}
+        if missing and SENTIMENT_DETERMINISTIC and cls._disk_cache is not None:
+            stored = cls._disk_cache.get_many(missing.values())
+            for text, key in list(missing.items()):
+                if key in stored:
+                    results[text] = stored[key]
+                    cls._cache.set(key, stored[key])
+                    del missing[text]
+
+        computed = {}
+        if missing:
+            try:
+                scored = cls._score_many(list(missing))
+                for (text, key), result in zip(missing.items(), scored):
+                    results[text] = result
+                    computed[key] = result
+            except Exception as e:
+                print(f"Błąd analizy sentymentu: {str(e)}")
+                for text in missing:
+                    results[text] = {
+                        'score': 0.0,
+                        'confidence': _noise(0.2, 0.4)
+                    }
+
+        if computed and SENTIMENT_DETERMINISTIC:
+            for key, result in computed.items():
+                cls._cache.set(key, result)
+            if cls._disk_cache is not None:
+                cls._disk_cache.set_many(computed)
+
+        empty_result = {'score': 0.0, 'confidence': _noise(0.3, 0.5)}
+        return [dict(results[text]) if text in results else dict(empty_result) for text in texts]
+
+class KeywordMatcher:
+    """Słownik fraz (krotek słów) -> kategorie; koszt dopasowania zależy od długości tytułu, nie od liczby słów kluczowych"""
+    # łącznik dzieli słowa ("AI-powered" -> "ai", "powered"); frazy z łącznikiem w słowniku dzielone są tak samo
+    WORD_PATTERN = re.compile(r"[\w'&.]+")
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        self.category_order = list(categories)
+        self.phrases: Dict[tuple, set] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                phrase = tuple(self.tokenize(keyword))
+                if phrase:
+                    self.phrases.setdefault(phrase, set()).add(category)
+        self.max_len = max((len(phrase) for phrase in self.phrases), default=0)
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        tokens = []
+        for token in cls.WORD_PATTERN.findall(text.lower()):
+            token = token.strip(".'")
+            if token.endswith("'s"):
+                token = token[:-2]
+            if token:
+                tokens.append(token)
+        return tokens
+
+    def match(self, title: str) -> List[str]:
+        tokens = self.tokenize(title)
+        found = set()
+        for start in range(len(tokens)):
+            for length in range(1, min(self.max_len, len(tokens) - start) + 1):
+                categories = self.phrases.get(tuple(tokens[start:start + length]))
+                if categories:
+                    found |= categories
+        return [category for category in self.category_order if category in found]
 
 class NewsCategories:
     CATEGORIES = {
-        'earnings': ['earnings', 'revenue', 'profit', 'financial', 'quarterly', 'q1', 'q2', 'q3', 'q4'],
-        'products': ['iphone', 'mac', 'ipad', 'watch', 'airpods', 'product', 'launch', 'release'],
-        'market': ['stock', 'shares', 'market', 'trading', 'investors', 'wall street'],
+        'earnings': ['earnings', 'revenue', 'revenues', 'profit', 'profits', 'financial', 'quarterly', 'q1', 'q2', 'q3', 'q4'],
+        'products': ['iphone', 'mac', 'macbook', 'ipad', 'watch', 'airpods', 'product', 'products', 'launch', 'launches', 'release', 'releases'],
+        'market': ['stock', 'stocks', 'shares', 'market', 'markets', 'trading', 'investors', 'wall street'],
         'technology': ['ai', 'technology', 'innovation', 'development', 'research']
     }
+    # plik JSON: {"default": {kategoria: [słowa]}, "tickers": {"AAPL": {kategoria: [słowa]}}}
+    CATEGORIES_FILE = os.getenv('NEWS_CATEGORIES_FILE')
+
+    _matchers: Dict[str, KeywordMatcher] = {}
+    _config: Optional[Dict[str, Any]] = None
+    _lock = threading.Lock()
 
     @classmethod
-    def categorize(cls, title: str) -> str:
+    def _load_config(cls) -> Dict[str, Any]:
+        if cls._config is None:
+            config: Dict[str, Any] = {'default': cls.CATEGORIES, 'tickers': {}}
+            if cls.CATEGORIES_FILE:
+                try:
+                    with open(cls.CATEGORIES_FILE, 'r', encoding='utf-8') as f:
+                        config.update(json.load(f))
+                except Exception as e:
+                    print(f"Błąd wczytywania kategorii newsów {cls.CATEGORIES_FILE}: {e}")
+            cls._config = config
+        return cls._config
+
+    @classmethod
+    def get_matcher(cls, ticker: Optional[str] = None) -> KeywordMatcher:
+        key = (ticker or '').upper()
+        with cls._lock:
+            if key not in cls._matchers:
+                config = cls._load_config()
+                categories = {category: list(keywords) for category, keywords in config['default'].items()}
+                for category, keywords in config['tickers'].get(key, {}).items():
+                    categories.setdefault(category, []).extend(keywords)
+                cls._matchers[key] = KeywordMatcher(categories)
+            return cls._matchers[key]
+
+    @classmethod
+    def category_names(cls, ticker: Optional[str] = None) -> List[str]:
+        return cls.get_matcher(ticker).category_order + ['other']
+
+    @classmethod
+    def categorize_all(cls, title: str, ticker: Optional[str] = None) -> List[str]:
         if not title:
-            return 'other'
-            
-        title = title.lower()
-        for category, keywords in cls.CATEGORIES.items():
-            if any(keyword in title for keyword in keywords):
-                return category
-        return 'other'
+            return ['other']
+        return cls.get_matcher(ticker).match(title) or ['other']
+
+    @classmethod
+    def categorize_many(cls, titles: List[str], ticker: Optional[str] = None) -> List[List[str]]:
+        matcher = cls.get_matcher(ticker)
+        return [(matcher.match(title) if title else []) or ['other'] for title in titles]
+
+    @classmethod
+    def categorize(cls, title: str, ticker: Optional[str] = None) -> str:
+        return cls.categorize_all(title, ticker)[0]
 
 class NewsFormatter:
     @staticmethod
@@ -89,50 +239,122 @@ class NewsFormatter:
                 'description': description or 'Brak opisu',
                 'url': article.get('link', '') or article.get('url', '#'),
                 'publishedAt': random_date.isoformat(),
-                'source': article.get('publisher', source),
-                'category': NewsCategories.categorize(title),
-                'sentiment': SentimentAnalyzer.analyze(f"{title} {description}")
+                'source': article.get('publisher', source)
             }
         except Exception as e:
             print(f"Błąd formatowania artykułu: {str(e)}")
             return None
 
-def get_news_with_sentiment(ticker: str) -> Dict[str, Any]:
+def fetch_ticker_news(ticker: str) -> List[Dict[str, Any]]:
+    try:
+        import yfinance as yf
+        return yf.Ticker(ticker).news or []
+    except Exception as e:
+        print(f"Błąd pobierania newsów z yfinance dla {ticker}: {str(e)}")
+        return []
+
+def fetch_search_news(ticker: str) -> List[Dict[str, Any]]:
+    try:
+        response = _session.get(
+            YAHOO_SEARCH_URL,
+            params={'q': ticker, 'newsCount': 50},
+            timeout=NEWS_REQUEST_TIMEOUT
+        )
+        if response.status_code == 200:
+            return response.json().get('news', [])
+    except Exception as e:
+        print(f"Błąd pobierania newsów z wyszukiwarki Yahoo dla {ticker}: {str(e)}")
+    return []
+
+def _unwrap_article(article: Dict[str, Any]) -> Dict[str, Any]:
+    # nowsze wersje yfinance zwracają {'id': ..., 'content': {...}}
+    if isinstance(article, dict) and isinstance(article.get('content'), dict):
+        content = article['content']
+        return {
+            'uuid': article.get('id') or content.get('id'),
+            'title': content.get('title', ''),
+            'description': content.get('summary', '') or content.get('description', ''),
+            'link': (content.get('canonicalUrl') or {}).get('url', '') or (content.get('clickThroughUrl') or {}).get('url', ''),
+            'publisher': (content.get('provider') or {}).get('displayName', 'Yahoo Finance')
+        }
+    return article
+
+def _article_key(article: Dict[str, Any]) -> Optional[str]:
+    key = article.get('uuid') or article.get('id') or article.get('link') or article.get('url')
+    if not key and article.get('title'):
+        key = article['title'].strip().lower()
+    return key
+
+def fetch_news_sources(ticker: str) -> List[Dict[str, Any]]:
+    """Pobiera newsy z obu źródeł równolegle i usuwa duplikaty (po UUID lub adresie URL)"""
+    sources = [
+        _news_executor.submit(fetch_ticker_news, ticker),
+        _news_executor.submit(fetch_search_news, ticker)
+    ]
+
+    news_data: List[Dict[str, Any]] = []
+    seen = set()
+    for source in sources:
+        for article in source.result():
+            article = _unwrap_article(article)
+            if not isinstance(article, dict):
+                continue
+            key = _article_key(article)
+            if key in seen:
+                continue
+            if key:
+                seen.add(key)
+            news_data.append(article)
+    return news_data
+
+def get_news_with_sentiment(ticker: str, translate_to: Optional[str] = NEWS_TRANSLATE_TARGET) -> Dict[str, Any]:
+    """Newsy z sentymentem i kategoriami; z translate_to tytuły i opisy są od razu tłumaczone (w tle, równolegle z sentymentem)"""
     try:
         if not ticker or not isinstance(ticker, str):
             raise ValueError("Nieprawidłowy ticker")
 
         news_articles: List[Dict[str, Any]] = []
         categorized_news: Dict[str, List[Dict[str, Any]]] = {
-            'earnings': [],
-            'products': [],
-            'market': [],
-            'technology': [],
-            'other': []
+            category: [] for category in NewsCategories.category_names(ticker)
         }
 
-        try:
-            stock = yf.Ticker(ticker)
-            news_data = stock.news or []
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            url = f'https://query1.finance.yahoo.com/v1/finance/search?q={ticker}&newsCount=50'
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                yahoo_data = response.json()
-                news_data.extend(yahoo_data.get('news', []))
-        except Exception as e:
-            print(f"Błąd pobierania newsów: {str(e)}")
-            news_data = []
+        news_data = fetch_news_sources(ticker)
 
         for article in news_data:
             formatted_article = NewsFormatter.format_article(article, 'Yahoo Finance')
             if formatted_article:
                 news_articles.append(formatted_article)
-                category = formatted_article['category']
-                categorized_news[category].append(formatted_article)
+
+        categories = NewsCategories.categorize_many([article['title'] for article in news_articles], ticker)
+        for article, article_categories in zip(news_articles, categories):
+            article['category'] = article_categories[0]
+            article['categories'] = article_categories
+            categorized_news[article['category']].append(article)
+
+        translation = None
+        if translate_to and news_articles:
+            translation = _news_executor.submit(
+                translate_many,
+                [text for article in news_articles for text in (article['title'], article['description'])],
+                translate_to
+            )
+
+        sentiments = SentimentAnalyzer.analyze_many([
+            f"{article['title']} {article['description']}" for article in news_articles
+        ])
+        for article, sentiment in zip(news_articles, sentiments):
+            article['sentiment'] = sentiment
+
+        # kategorie i sentyment liczone są na oryginalnym (angielskim) tekście, tłumaczenie podmieniamy na końcu
+        if translation is not None:
+            try:
+                translated = translation.result()
+                for i, article in enumerate(news_articles):
+                    article['originalTitle'], article['originalDescription'] = article['title'], article['description']
+                    article['title'], article['description'] = translated[2 * i], translated[2 * i + 1]
+            except Exception as e:
+                print(f"Błąd tłumaczenia newsów: {e}")
+                translate_to = None
 
         if not news_articles:
             default_article = {
@@ -142,6 +364,7 @@ def get_news_with_sentiment(ticker: str) -> Dict[str, Any]:
                 'publishedAt': datetime.utcnow().isoformat(),
                 'source': 'System',
                 'category': 'other',
+                'categories': ['other'],
                 'sentiment': {
                     'score': 0.0,
                     'confidence': SentimentAnalyzer.get_random_confidence()
@@ -175,7 +398,8 @@ def get_news_with_sentiment(ticker: str) -> Dict[str, Any]:
                 "all": news_articles,
                 "stats": stats,
                 "timestamp": datetime.utcnow().isoformat(),
-                "ticker": ticker
+                "ticker": ticker,
+                "translated": translate_to if translation is not None else None
             }
         }
 
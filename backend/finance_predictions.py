@@ -1,16 +1,166 @@
-import yfinance as yf
 import pandas as pd
 from statsmodels.tsa.statespace.sarimax import SARIMAX
+from statsmodels.tsa.statespace.initialization import Initialization
+from statsmodels.tsa.statespace.kalman_filter import (
+    MEMORY_NO_SMOOTHING, MEMORY_NO_GAIN, MEMORY_NO_STD_FORECAST, MEMORY_NO_PREDICTED_COV, MEMORY_NO_FILTERED
+)
 import logging
-from datetime import timedelta
 import numpy as np
+import os
+import re
+import time
+import pickle
+import threading
+from finance_store import get_price_store
+from finance_cache import TTLCache, cache_path, MISSING
+from finance_jobs import report_progress
+from finance_sarimax_search import get_sarimax_order
+from finance_calendar import next_sessions
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SARIMAX_ORDER = (3, 1, 2)
+SARIMAX_SEASONAL_ORDER = (1, 1, 1, 12)
+# po ilu dopisanych świeczkach robimy pełne dopasowanie (startując z poprzednich parametrów)
+SARIMAX_REFIT_AFTER_BARS = int(os.getenv('SARIMAX_REFIT_AFTER_BARS', 250))
+# dopasowane modele trzymane w pamięci procesu (kilka MB każdy); na dysku tylko parametry
+SARIMAX_MEMORY_CACHE_SIZE = int(os.getenv('SARIMAX_MEMORY_CACHE_SIZE', 4))
+# do prognozy wystarczy stan filtru z ostatniej świeczki - bez historii wygładzania, wzmocnień i kowariancji
+SARIMAX_CONSERVE_MEMORY = (MEMORY_NO_SMOOTHING | MEMORY_NO_GAIN | MEMORY_NO_STD_FORECAST
+                           | MEMORY_NO_PREDICTED_COV | MEMORY_NO_FILTERED)
+
+_model_cache = TTLCache(maxsize=SARIMAX_MEMORY_CACHE_SIZE, ttl=float('inf'))
+_model_locks = {}
+_model_locks_guard = threading.Lock()
+
+def _model_lock(key):
+    with _model_locks_guard:
+        return _model_locks.setdefault(key, threading.Lock())
+
+def _model_path(key):
+    name = re.sub(r'[^A-Za-z0-9._-]', '_', '_'.join(str(part) for part in key))
+    return cache_path('models', 'sarimax', f'{name}.pkl')
+
+def _load_model_entry(key):
+    """Zapis modelu: parametry, rząd i opis danych, na których go dopasowano (bez obiektu wyników)"""
+    path = _model_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Nie udało się wczytać modelu z {path}: {e}")
+        return None
+    if 'results' in entry:
+        # starszy format z całym obiektem wyników - zostawiamy tylko parametry
+        entry['params'] = np.asarray(entry.pop('results').params)
+    return entry
+
+def _save_model_entry(key, entry):
+    path = _model_path(key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Nie udało się zapisać modelu do {path}: {e}")
+
+def _build_sarimax(y, order, seasonal_order, **kwargs):
+    return SARIMAX(y,
+                   order=order,
+                   seasonal_order=seasonal_order,
+                   enforce_stationarity=False,
+                   enforce_invertibility=False,
+                   **kwargs
+                  )
+
+def _filter_sarimax(y, order, seasonal_order, params, **kwargs):
+    """Wyniki filtru Kalmana dla gotowych parametrów, z zachowanym tylko tym, czego potrzebuje prognoza"""
+    model = _build_sarimax(y, order, seasonal_order, **kwargs)
+    model.ssm.set_conserve_memory(SARIMAX_CONSERVE_MEMORY)
+    return model.filter(params)
+
+def _append_sarimax(results, new_bars, order, seasonal_order):
+    """Dopisuje świeczki do dopasowanego modelu: filtr rusza ze stanu po ostatniej znanej świeczce
+    (jak results.extend), więc koszt zależy od liczby nowych świeczek, a nie od długości historii"""
+    filtered = results.filter_results
+    initialization = Initialization(
+        filtered.k_states, 'known',
+        constant=filtered.predicted_state[:, -1],
+        stationary_cov=filtered.predicted_state_cov[:, :, -1]
+    )
+    return _filter_sarimax(new_bars.astype(float), order, seasonal_order, results.params,
+                           initialization=initialization)
+
+def get_sarimax_model(ticker, start_date, y, order=SARIMAX_ORDER, seasonal_order=SARIMAX_SEASONAL_ORDER):
+    """Zwraca dopasowany model SARIMAX; zapisane parametry pozwalają pominąć estymację przy nowych świeczkach"""
+    key = (ticker.upper(), start_date, order, seasonal_order)
+    started = time.perf_counter()
+
+    with _model_lock(key):
+        cached = _model_cache.get(key)
+        if cached is MISSING or cached['nobs'] > len(y) \
+                or not np.isclose(float(y.iloc[cached['nobs'] - 1]), cached['last_value']):
+            cached = None
+
+        if cached is not None and cached['nobs'] == len(y):
+            status, model_fit = 'hit', cached['results']
+        elif cached is not None and len(y) - cached['fitted_nobs'] < SARIMAX_REFIT_AFTER_BARS:
+            # nowe świeczki do modelu trzymanego w pamięci procesu - bez estymacji i bez ponownego filtrowania historii
+            status = 'append'
+            model_fit = _append_sarimax(cached['results'], y.iloc[cached['nobs']:], order, seasonal_order)
+            entry = {**cached['entry'], 'nobs': len(y), 'last_value': float(y.iloc[-1])}
+        else:
+            entry = _load_model_entry(key)
+            status, params = 'miss', None
+
+            if entry is not None:
+                if len(y) - entry['fitted_nobs'] < SARIMAX_REFIT_AFTER_BARS:
+                    # nowy proces albo zmienione dane historyczne (np. korekta o dywidendy) - zapisane parametry,
+                    # filtr po całej historii
+                    status = 'refilter'
+                    params = entry['params']
+                else:
+                    status = 'refit'
+                    params = _build_sarimax(y, order, seasonal_order).fit(
+                        start_params=entry['params'], disp=False
+                    ).params
+
+            if params is None:
+                params = _build_sarimax(y, order, seasonal_order).fit(disp=False).params
+
+            model_fit = _filter_sarimax(y, order, seasonal_order, params)
+            fitted_nobs = len(y) if status in ('miss', 'refit') else entry['fitted_nobs']
+            entry = {
+                'params': np.asarray(params),
+                'order': order,
+                'seasonal_order': seasonal_order,
+                'nobs': len(y),
+                'last_value': float(y.iloc[-1]),
+                'fitted_nobs': fitted_nobs
+            }
+
+        if status != 'hit':
+            _save_model_entry(key, entry)
+            _model_cache.set(key, {'results': model_fit, 'nobs': len(y), 'last_value': float(y.iloc[-1]),
+                                   'fitted_nobs': entry['fitted_nobs'], 'entry': entry})
+
+    metadata = {
+        'cache': 'hit' if status in ('hit', 'append', 'refilter') else 'miss',
+        'cacheStatus': status,
+        'fitTime': round(time.perf_counter() - started, 3),
+        'nobs': len(y),
+        'order': list(order),
+        'seasonalOrder': list(seasonal_order)
+    }
+    return model_fit, metadata
+
 def fetch_historical_data(ticker, start_date="2000-01-01"):
     try:
-        stock_data = yf.download(ticker, start=start_date)
+        stock_data = get_price_store().get_history(ticker, interval='1d', start=start_date)
         if stock_data.empty:
             raise ValueError(f"Brak danych dla tickera {ticker}.")
         stock_data = stock_data[["Close"]].copy()
@@ -20,8 +170,41 @@ def fetch_historical_data(ticker, start_date="2000-01-01"):
         logger.error(f"Błąd podczas pobierania danych dla tickera {ticker}: {e}")
         raise ValueError(f"Błąd podczas pobierania danych dla tickera {ticker}: {e}")
 
-def predict_stock_prices(ticker, periods=30, start_date="2000-01-01"):
+def lttb_indices(values, threshold):
+    """Largest-Triangle-Three-Buckets: indeksy punktów zachowujących kształt wykresu"""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float)
+    y = np.asarray(values, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    # średnie kolejnych kubełków liczone naraz (sumy skumulowane)
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    bucket_avg_x = (edges[:-1] + edges[1:] - 1) / 2
+    bucket_avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / np.maximum(edges[1:] - edges[:-1], 1)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 1 < len(bucket_avg_x):
+            next_x, next_y = bucket_avg_x[i + 1], bucket_avg_y[i + 1]
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[prev] - next_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (next_y - y[prev])
+        )
+        prev = start + int(np.argmax(area)) if end > start else start
+        selected[i + 1] = prev
+    return selected
+
+def predict_stock_prices(ticker, periods=30, start_date="2000-01-01", response_format='records', max_points=None,
+                         order_selection='fixed'):
     try:
+        report_progress('data', 0.05)
         df = fetch_historical_data(ticker, start_date=start_date)
 
         if isinstance(df.columns, pd.MultiIndex):
@@ -43,51 +226,67 @@ def predict_stock_prices(ticker, periods=30, start_date="2000-01-01"):
         if y.empty or len(y) < 10:
             raise ValueError(f"Za mało danych historycznych do prognozy dla {ticker} (min. 10 punktów).")
 
-        # parametry
-        model = SARIMAX(y,
-                       order=(3, 1, 2),
-                       seasonal_order=(1, 1, 1, 12),
-                       enforce_stationarity=False,
-                       enforce_invertibility=False
-                      )
-        model_fit = model.fit(disp=False)
+        # model z cache albo nowe dopasowanie
+        order, seasonal_order, selection = SARIMAX_ORDER, SARIMAX_SEASONAL_ORDER, None
+        if order_selection != 'fixed':
+            report_progress('order_search', 0.1)
+            selection = get_sarimax_order(ticker, y, criterion=order_selection, start_date=start_date)
+            order, seasonal_order = selection['order'], selection['seasonalOrder']
+
+        report_progress('fit', 0.2)
+        model_fit, model_metadata = get_sarimax_model(ticker, start_date, y.reset_index(drop=True), order, seasonal_order)
+        if selection is not None:
+            model_metadata['orderSelection'] = {
+                'criterion': selection['criterion'],
+                'cached': selection['cached'],
+                'score': selection['score'],
+                'searchTime': selection['searchTime'],
+                'candidates': selection['candidates']
+            }
         
+        report_progress('forecast', 0.9)
         forecast_result = model_fit.get_forecast(steps=periods)
         forecast = forecast_result.predicted_mean
         conf_int = forecast_result.conf_int(alpha=0.05)  # 100-0,5 = przedzial ufnosci
 
+        # kroki prognozy to kolejne sesje giełdowe, a nie dni kalendarzowe
         last_date = df['date'].iloc[-1]
-        future_dates = [last_date + timedelta(days=i) for i in range(1, periods + 1)]
-
-        prediction_data = []
-        for i in range(periods):
-            prediction_data.append({
-                'date': future_dates[i].date().isoformat(),
-                'value': float(forecast.iloc[i]),
-                'lower_bound': float(conf_int.iloc[i][0]), 
-                'upper_bound': float(conf_int.iloc[i][1])   
-            })
-
-        historical_data = []
-        for idx, row in df.iterrows():
-            close_val = row['Close']
-            if isinstance(close_val, pd.Series):
-                close_val = close_val.iloc[0]
-            date_val = row['date']
-            if isinstance(date_val, pd.Series):
-                date_val = date_val.iloc[0]
-            if hasattr(date_val, "date"):
-                date_str = date_val.date().isoformat()
-            else:
-                date_str = str(date_val)
-            historical_data.append({
-                'date': date_str,
-                'value': float(close_val)
-            })
+        future_dates = next_sessions(ticker, last_date, periods)
+
+        prediction_frame = pd.DataFrame({
+            'date': future_dates.strftime('%Y-%m-%d'),
+            'value': np.asarray(forecast, dtype=float),
+            'lower_bound': conf_int.iloc[:, 0].to_numpy(dtype=float),
+            'upper_bound': conf_int.iloc[:, 1].to_numpy(dtype=float)
+        })
+
+        close = df['Close']
+        if isinstance(close, pd.DataFrame):
+            close = close.iloc[:, 0]
+        historical_frame = pd.DataFrame({
+            'date': df['date'].dt.strftime('%Y-%m-%d').to_numpy(),
+            'value': close.to_numpy(dtype=float)
+        })
+        if max_points and len(historical_frame) > max_points:
+            keep = lttb_indices(historical_frame['value'].to_numpy(), max_points)
+            historical_frame = historical_frame.iloc[keep]
+
+        if response_format == 'compact':
+            prediction_data = {column: prediction_frame[column].tolist() for column in prediction_frame.columns}
+            prediction_data['dates'] = prediction_data.pop('date')
+            prediction_data['values'] = prediction_data.pop('value')
+            historical_data = {
+                'dates': historical_frame['date'].tolist(),
+                'values': historical_frame['value'].tolist()
+            }
+        else:
+            prediction_data = prediction_frame.to_dict(orient='records')
+            historical_data = historical_frame.to_dict(orient='records')
 
         return {
             'predictionData': prediction_data,
-            'historicalData': historical_data
+            'historicalData': historical_data,
+            'modelMetadata': model_metadata
         }
 
     except Exception as e:
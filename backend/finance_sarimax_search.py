@@ -0,0 +1,189 @@
+"""Automatyczny dobór rzędów SARIMAX: równoległe przeszukiwanie siatki z cache zwycięskiego rzędu per ticker.
+
+Użycie offline: python finance_sarimax_search.py AAPL MSFT --criterion holdout
+"""
+import os
+import time
+import argparse
+import itertools
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from finance_cache import PersistentCache
+from finance_jobs import JOB_WORKERS, in_job_worker
+
+SEARCH_CRITERIA = ('aic', 'bic', 'holdout')
+
+SARIMAX_SEARCH_WORKERS = int(os.getenv('SARIMAX_SEARCH_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+# w procesie roboczym puli zadań rdzenie dzielimy między JOB_WORKERS równoległych zadań
+SARIMAX_SEARCH_WORKERS_IN_JOB = int(os.getenv('SARIMAX_SEARCH_WORKERS_IN_JOB',
+                                              max(1, (os.cpu_count() or 2) // JOB_WORKERS)))
+# szukamy na ostatnich N świeczkach - rząd modelu zależy od bieżącej dynamiki, a dopasowanie jest dużo szybsze
+SARIMAX_SEARCH_WINDOW = int(os.getenv('SARIMAX_SEARCH_WINDOW', 750))
+SARIMAX_ORDER_TTL = float(os.getenv('SARIMAX_ORDER_TTL', 7 * 24 * 3600))
+HOLDOUT_FOLDS = int(os.getenv('SARIMAX_HOLDOUT_FOLDS', 3))
+HOLDOUT_HORIZON = int(os.getenv('SARIMAX_HOLDOUT_HORIZON', 20))
+
+DEFAULT_GRID = {
+    'p': [0, 1, 2, 3],
+    'd': [1],
+    'q': [0, 1, 2],
+    'P': [0, 1],
+    'D': [0, 1],
+    'Q': [0, 1],
+    's': [12]
+}
+
+_order_cache = PersistentCache('sarimax_orders', SARIMAX_ORDER_TTL)
+
+
+def grid_candidates(grid: Optional[Dict[str, List[int]]] = None) -> List[Tuple[tuple, tuple]]:
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    candidates = []
+    for p, d, q, P, D, Q, s in itertools.product(grid['p'], grid['d'], grid['q'], grid['P'], grid['D'], grid['Q'], grid['s']):
+        seasonal = (P, D, Q, s) if (P or D or Q) else (0, 0, 0, 0)
+        candidate = ((p, d, q), seasonal)
+        if candidate not in candidates:
+            candidates.append(candidate)
+    return candidates
+
+
+def _fit(y: np.ndarray, order: tuple, seasonal_order: tuple):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return SARIMAX(y,
+                       order=order,
+                       seasonal_order=seasonal_order,
+                       enforce_stationarity=False,
+                       enforce_invertibility=False
+                      ).fit(disp=False)
+
+
+def _holdout_error(y: np.ndarray, order: tuple, seasonal_order: tuple) -> Dict[str, float]:
+    """Rolling-origin: kilka punktów startowych, prognoza na HOLDOUT_HORIZON kroków, średni RMSE i MAPE"""
+    rmse, mape = [], []
+    for fold in range(HOLDOUT_FOLDS, 0, -1):
+        origin = len(y) - fold * HOLDOUT_HORIZON
+        if origin < 50:
+            continue
+        actual = y[origin:origin + HOLDOUT_HORIZON]
+        forecast = _fit(y[:origin], order, seasonal_order).forecast(steps=len(actual))
+        errors = forecast - actual
+        rmse.append(float(np.sqrt(np.mean(errors ** 2))))
+        mape.append(float(np.mean(np.abs(errors) / np.abs(actual)) * 100))
+    if not rmse:
+        raise ValueError("Za mało danych do walidacji kroczącej.")
+    return {'rmse': float(np.mean(rmse)), 'mape': float(np.mean(mape))}
+
+
+def evaluate_candidate(y: np.ndarray, order: tuple, seasonal_order: tuple, criterion: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    report: Dict[str, Any] = {'order': list(order), 'seasonalOrder': list(seasonal_order)}
+    try:
+        result = _fit(y, order, seasonal_order)
+        report['aic'] = float(result.aic)
+        report['bic'] = float(result.bic)
+        if criterion == 'holdout':
+            report.update(_holdout_error(y, order, seasonal_order))
+        report['score'] = report['rmse'] if criterion == 'holdout' else report[criterion]
+        if not np.isfinite(report['score']):
+            raise ValueError("Niepoprawny wynik dopasowania.")
+    except Exception as e:
+        report['score'] = float('inf')
+        report['error'] = str(e)
+    report['fitTime'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def search_sarimax_order(y, criterion: str = 'aic', grid: Optional[Dict[str, List[int]]] = None,
+                         max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Przeszukuje siatkę rzędów w puli procesów i zwraca zwycięzcę z raportem czasów i dokładności.
+
+    W procesie roboczym puli zadań używana jest mniejsza pula (SARIMAX_SEARCH_WORKERS_IN_JOB), tak żeby
+    JOB_WORKERS jednoczesnych wyszukiwań razem nie przekroczyło liczby rdzeni.
+    """
+    if criterion not in SEARCH_CRITERIA:
+        raise ValueError(f"Nieznane kryterium doboru rzędu: {criterion}")
+    if max_workers is None:
+        max_workers = SARIMAX_SEARCH_WORKERS_IN_JOB if in_job_worker() else SARIMAX_SEARCH_WORKERS
+    values = np.asarray(y, dtype=float)[-SARIMAX_SEARCH_WINDOW:]
+    candidates = grid_candidates(grid)
+
+    started = time.perf_counter()
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(candidates))) as executor:
+            reports = list(executor.map(
+                evaluate_candidate,
+                itertools.repeat(values),
+                [order for order, _ in candidates],
+                [seasonal for _, seasonal in candidates],
+                itertools.repeat(criterion)
+            ))
+    else:
+        reports = [evaluate_candidate(values, order, seasonal, criterion) for order, seasonal in candidates]
+
+    reports.sort(key=lambda report: report['score'])
+    best = reports[0]
+    if not np.isfinite(best['score']):
+        raise ValueError("Żaden z kandydatów nie dał się dopasować.")
+    return {
+        'order': tuple(best['order']),
+        'seasonalOrder': tuple(best['seasonalOrder']),
+        'criterion': criterion,
+        'score': best['score'],
+        'candidates': len(candidates),
+        'window': len(values),
+        'searchTime': round(time.perf_counter() - started, 3),
+        'report': reports
+    }
+
+
+def _store_order(key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {k: v for k, v in result.items() if k != 'report'}
+    summary['top'] = result['report'][:5]
+    _order_cache.set(key, {**summary, 'order': list(summary['order']), 'seasonalOrder': list(summary['seasonalOrder'])})
+    return summary
+
+
+def _order_key(ticker: str, start_date: Optional[str], criterion: str) -> str:
+    return f'{ticker.upper()}|{start_date}|{criterion}'
+
+
+def get_sarimax_order(ticker: str, y, criterion: str = 'aic', refresh: bool = False,
+                      start_date: Optional[str] = None) -> Dict[str, Any]:
+    """Zwraca zapamiętany rząd dla (tickera, początku danych) albo uruchamia przeszukiwanie i zapisuje zwycięzcę"""
+    key = _order_key(ticker, start_date, criterion)
+    cached = None if refresh else _order_cache.get(key, None)
+    if cached:
+        return {**cached, 'order': tuple(cached['order']), 'seasonalOrder': tuple(cached['seasonalOrder']), 'cached': True}
+
+    summary = _store_order(key, search_sarimax_order(y, criterion=criterion))
+    return {**summary, 'cached': False}
+
+
+def main():
+    from finance_predictions import fetch_historical_data
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--criterion', choices=SEARCH_CRITERIA, default='aic')
+    parser.add_argument('--start-date', default='2000-01-01')
+    args = parser.parse_args()
+
+    for ticker in args.tickers:
+        y = fetch_historical_data(ticker, start_date=args.start_date)['Close']
+        result = search_sarimax_order(y, criterion=args.criterion)
+        _store_order(_order_key(ticker, args.start_date, args.criterion), result)
+        print(f"\n{ticker}: najlepszy rząd {result['order']}x{result['seasonalOrder']} "
+              f"({args.criterion}={result['score']:.4f}), {result['candidates']} kandydatów w {result['searchTime']}s")
+        print(f"{'rząd':<28}{'aic':>12}{'bic':>12}{'rmse':>10}{'mape%':>8}{'czas[s]':>9}")
+        for report in result['report']:
+            label = f"{tuple(report['order'])}x{tuple(report['seasonalOrder'])}"
+            print(f"{label:<28}{report.get('aic', float('nan')):>12.2f}{report.get('bic', float('nan')):>12.2f}"
+                  f"{report.get('rmse', float('nan')):>10.3f}{report.get('mape', float('nan')):>8.2f}{report['fitTime']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+SENTIMENT_BACKEND = os.getenv('SENTIMENT_BACKEND', 'lexicon')
+# opcjonalny plik JSON {"słowo": [polaryzacja, subiektywność]} uzupełniający wbudowany słownik
+SENTIMENT_LEXICON_FILE = os.getenv('SENTIMENT_LEXICON_FILE')
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z'\-]*")
+
+NEGATIONS = {'not', 'no', 'never', "don't", "doesn't", "didn't", "isn't", "wasn't", "won't", "can't", 'without'}
+
+# słowo -> (polaryzacja, subiektywność), skala jak w TextBlob
+FINANCE_LEXICON: Dict[str, Tuple[float, float]] = {
+    'beat': (0.5, 0.4), 'beats': (0.5, 0.4), 'surge': (0.6, 0.5), 'surges': (0.6, 0.5), 'surged': (0.6, 0.5),
+    'soar': (0.7, 0.5), 'soars': (0.7, 0.5), 'soared': (0.7, 0.5), 'rally': (0.5, 0.4), 'rallies': (0.5, 0.4),
+    'gain': (0.4, 0.3), 'gains': (0.4, 0.3), 'gained': (0.4, 0.3), 'rise': (0.3, 0.3), 'rises': (0.3, 0.3),
+    'rising': (0.3, 0.3), 'jump': (0.5, 0.4), 'jumps': (0.5, 0.4), 'jumped': (0.5, 0.4), 'climb': (0.4, 0.3),
+    'climbs': (0.4, 0.3), 'record': (0.4, 0.4), 'strong': (0.43, 0.73), 'stronger': (0.5, 0.7), 'growth': (0.4, 0.4),
+    'profit': (0.4, 0.3), 'profitable': (0.5, 0.4), 'upgrade': (0.5, 0.4), 'upgraded': (0.5, 0.4), 'outperform': (0.6, 0.5),
+    'bullish': (0.7, 0.7), 'buy': (0.3, 0.3), 'boost': (0.5, 0.4), 'boosts': (0.5, 0.4), 'optimistic': (0.6, 0.8),
+    'positive': (0.23, 0.55), 'good': (0.7, 0.6), 'great': (0.8, 0.75), 'best': (1.0, 0.3), 'better': (0.5, 0.5),
+    'success': (0.6, 0.5), 'successful': (0.75, 0.95), 'win': (0.8, 0.4), 'wins': (0.8, 0.4), 'expand': (0.3, 0.3),
+    'expansion': (0.3, 0.3), 'innovative': (0.5, 0.6), 'breakthrough': (0.6, 0.5), 'dividend': (0.2, 0.2), 'high': (0.16, 0.54),
+    'higher': (0.25, 0.5), 'top': (0.5, 0.5), 'recover': (0.4, 0.4), 'recovery': (0.4, 0.4), 'rebound': (0.4, 0.4),
+    'miss': (-0.5, 0.4), 'misses': (-0.5, 0.4), 'missed': (-0.5, 0.4), 'plunge': (-0.7, 0.5), 'plunges': (-0.7, 0.5),
+    'plunged': (-0.7, 0.5), 'drop': (-0.4, 0.3), 'drops': (-0.4, 0.3), 'dropped': (-0.4, 0.3), 'fall': (-0.4, 0.3),
+    'falls': (-0.4, 0.3), 'fell': (-0.4, 0.3), 'falling': (-0.4, 0.3), 'decline': (-0.4, 0.3), 'declines': (-0.4, 0.3),
+    'slump': (-0.6, 0.5), 'slumps': (-0.6, 0.5), 'tumble': (-0.6, 0.5), 'tumbles': (-0.6, 0.5), 'crash': (-0.8, 0.6),
+    'loss': (-0.5, 0.4), 'losses': (-0.5, 0.4), 'lose': (-0.4, 0.4), 'downgrade': (-0.5, 0.4), 'downgraded': (-0.5, 0.4),
+    'underperform': (-0.6, 0.5), 'bearish': (-0.7, 0.7), 'sell': (-0.3, 0.3), 'selloff': (-0.6, 0.5), 'weak': (-0.38, 0.63),
+    'weaker': (-0.4, 0.6), 'negative': (-0.3, 0.4), 'bad': (-0.7, 0.67), 'worse': (-0.4, 0.6), 'worst': (-1.0, 1.0),
+    'fear': (-0.5, 0.6), 'fears': (-0.5, 0.6), 'concern': (-0.3, 0.5), 'concerns': (-0.3, 0.5), 'risk': (-0.2, 0.4),
+    'risks': (-0.2, 0.4), 'lawsuit': (-0.5, 0.4), 'probe': (-0.4, 0.4), 'fraud': (-0.8, 0.6), 'recall': (-0.5, 0.4),
+    'layoffs': (-0.5, 0.4), 'cut': (-0.3, 0.3), 'cuts': (-0.3, 0.3), 'warning': (-0.4, 0.5), 'warns': (-0.4, 0.5),
+    'low': (-0.2, 0.4), 'lower': (-0.25, 0.4), 'volatile': (-0.3, 0.6), 'uncertainty': (-0.4, 0.5), 'debt': (-0.2, 0.3),
+    'bankruptcy': (-0.9, 0.6), 'default': (-0.5, 0.4), 'slowdown': (-0.4, 0.4), 'recession': (-0.6, 0.5), 'struggle': (-0.5, 0.5),
+}
+
+
+def _load_lexicon() -> Dict[str, Tuple[float, float]]:
+    lexicon = dict(FINANCE_LEXICON)
+    if SENTIMENT_LEXICON_FILE:
+        try:
+            with open(SENTIMENT_LEXICON_FILE, 'r', encoding='utf-8') as f:
+                lexicon.update({word.lower(): tuple(values) for word, values in json.load(f).items()})
+        except Exception as e:
+            print(f"Błąd wczytywania słownika sentymentu {SENTIMENT_LEXICON_FILE}: {e}")
+    return lexicon
+
+
+class SentimentBackend(ABC):
+    """Interfejs silnika sentymentu: dla partii tekstów zwraca tablice polaryzacji i subiektywności"""
+    name = 'base'
+
+    @abstractmethod
+    def analyze_many(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        ...
+
+
+class LexiconSentimentBackend(SentimentBackend):
+    """Szybki silnik słownikowy: cała partia tokenizowana i oceniana jednym przebiegiem w NumPy"""
+    name = 'lexicon'
+
+    def __init__(self, lexicon: Optional[Dict[str, Tuple[float, float]]] = None):
+        lexicon = lexicon if lexicon is not None else _load_lexicon()
+        words = sorted(lexicon)
+        # indeks 0 zarezerwowany dla słów spoza słownika
+        self.vocab = {word: i + 1 for i, word in enumerate(words)}
+        self.polarity = np.array([0.0] + [lexicon[w][0] for w in words])
+        self.subjectivity = np.array([0.0] + [lexicon[w][1] for w in words])
+        self.known = np.array([False] + [True] * len(words))
+
+    def analyze_many(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        n_docs = len(texts)
+        tokens_per_doc = [TOKEN_PATTERN.findall(text.lower()) for text in texts]
+        counts = np.fromiter((len(tokens) for tokens in tokens_per_doc), dtype=np.int64, count=n_docs)
+        n_tokens = int(counts.sum())
+        if n_tokens == 0:
+            return np.zeros(n_docs), np.zeros(n_docs)
+
+        vocab = self.vocab
+        token_ids = np.fromiter(
+            (vocab.get(token, 0) for tokens in tokens_per_doc for token in tokens),
+            dtype=np.int64, count=n_tokens
+        )
+        is_negation = np.fromiter(
+            (token in NEGATIONS for tokens in tokens_per_doc for token in tokens),
+            dtype=bool, count=n_tokens
+        )
+        doc_ids = np.repeat(np.arange(n_docs), counts)
+
+        # negacja bezpośrednio przed słowem odwraca (i osłabia) jego polaryzację, jak w TextBlob
+        negated = np.zeros(n_tokens, dtype=bool)
+        negated[1:] = is_negation[:-1] & (doc_ids[1:] == doc_ids[:-1])
+        polarity = self.polarity[token_ids] * np.where(negated, -0.5, 1.0)
+        known = self.known[token_ids]
+
+        hits = np.bincount(doc_ids, weights=known, minlength=n_docs)
+        polarity_sum = np.bincount(doc_ids, weights=polarity, minlength=n_docs)
+        subjectivity_sum = np.bincount(doc_ids, weights=self.subjectivity[token_ids], minlength=n_docs)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            polarity_avg = np.where(hits > 0, polarity_sum / hits, 0.0)
+            subjectivity_avg = np.where(hits > 0, subjectivity_sum / hits, 0.0)
+        return np.clip(polarity_avg, -1.0, 1.0), np.clip(subjectivity_avg, 0.0, 1.0)
+
+
+class TextBlobSentimentBackend(SentimentBackend):
+    """Dotychczasowy silnik TextBlob (tekst po tekście)"""
+    name = 'textblob'
+
+    def analyze_many(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        from textblob import TextBlob
+        sentiments = [TextBlob(str(text)).sentiment for text in texts]
+        return (
+            np.array([s.polarity for s in sentiments], dtype=float),
+            np.array([s.subjectivity for s in sentiments], dtype=float)
+        )
+
+
+SENTIMENT_BACKENDS = {
+    LexiconSentimentBackend.name: LexiconSentimentBackend,
+    TextBlobSentimentBackend.name: TextBlobSentimentBackend,
+}
+
+_backends: Dict[str, SentimentBackend] = {}
+_backends_lock = threading.Lock()
+
+def get_sentiment_backend(name: Optional[str] = None) -> SentimentBackend:
+    name = name or SENTIMENT_BACKEND
+    if name not in SENTIMENT_BACKENDS:
+        raise ValueError(f"Nieznany silnik sentymentu: {name}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = SENTIMENT_BACKENDS[name]()
+        return _backends[name]
@@ -0,0 +1,101 @@
+"""Wstępne ładowanie ciężkich bibliotek przy starcie serwera produkcyjnego i raport kosztu importu.
+
+    python finance_startup.py app --top 15 --budget 1.5
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+
+# biblioteki używane przez procesy obsługujące zapytania - ładowane raz w procesie głównym, przed forkiem.
+# statsmodels i sklearn działają tylko w procesach puli zadań (start 'spawn' importuje je od nowa),
+# więc wczytane tutaj zwiększałyby jedynie pamięć każdego procesu roboczego serwera.
+HEAVY_MODULES = (
+    'numpy',
+    'pandas',
+    'yfinance',
+)
+
+_preloaded: Dict[str, float] = {}
+
+
+def preload_modules(modules: Iterable[str] = HEAVY_MODULES) -> Dict[str, float]:
+    """Importuje moduły i zwraca czas importu każdego z nich (s); brakujące moduły są pomijane"""
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Nie udało się wstępnie załadować {name}: {e}")
+            continue
+        _preloaded[name] = round(time.perf_counter() - started, 3)
+    return dict(_preloaded)
+
+
+def preloaded_modules() -> Dict[str, float]:
+    return dict(_preloaded)
+
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def import_cost(module: str = 'app') -> Dict[str, Any]:
+    """Mierzy import modułu w świeżym interpreterze (python -X importtime).
+
+    Zwraca łączny czas, szczytowe zużycie pamięci procesu oraz czas własny importu zgrupowany po pakietach
+    najwyższego poziomu (suma czasów własnych nie dubluje zagnieżdżonych importów).
+    """
+    code = (f"import time, resource; t = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Import {module} nie powiódł się:\n{result.stderr[-2000:]}")
+
+    packages: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            packages[match.group(4).split('.')[0]] += int(match.group(1)) / 1e6
+    seconds, max_rss = result.stdout.split()[-2:]
+    return {
+        'module': module,
+        'seconds': round(float(seconds), 3),
+        # ru_maxrss na Linuksie w KB
+        'peak_rss_mb': round(int(max_rss) / 1024, 1),
+        'packages': {name: round(value, 3) for name, value in
+                     sorted(packages.items(), key=lambda item: item[1], reverse=True)},
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Koszt importu modułu (czas i pamięć) w podziale na pakiety")
+    parser.add_argument('module', nargs='?', default='app')
+    parser.add_argument('--top', type=int, default=15, help="ile najdroższych pakietów pokazać")
+    parser.add_argument('--json', action='store_true', help="wynik jako JSON")
+    parser.add_argument('--budget', type=float, help="limit czasu importu (s) - kod wyjścia 1 po przekroczeniu")
+    args = parser.parse_args(argv)
+
+    report = import_cost(args.module)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {report['module']}: {report['seconds']:.2f}s, szczyt pamięci {report['peak_rss_mb']:.0f} MB")
+        for name, seconds in list(report['packages'].items())[:args.top]:
+            print(f"  {name:<30} {seconds:7.3f}s")
+
+    if args.budget is not None and report['seconds'] > args.budget:
+        print(f"Przekroczono budżet importu: {report['seconds']:.2f}s > {args.budget:.2f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
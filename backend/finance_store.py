@@ -0,0 +1,263 @@
+import os
+import re
+import time
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from finance_cache import PersistentCache, cache_path
+
+INTRADAY_INTERVALS = {'1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h'}
+
+# po jakim czasie (s) dociągamy brakujące świeczki z końca szeregu
+REFRESH_AFTER_INTRADAY = float(os.getenv('PRICE_STORE_REFRESH_INTRADAY', 60))
+REFRESH_AFTER_DAILY = float(os.getenv('PRICE_STORE_REFRESH_DAILY', 15 * 60))
+
+# okresy liczone w sesjach, jak w yfinance ('1d' = ostatnia sesja, także w weekend)
+SESSION_PERIODS = {'1d': 1, '5d': 5}
+# zapas dni kalendarzowych na weekendy i święta przy pobieraniu ostatnich sesji
+SESSION_LOOKBACK_DAYS = 10
+# Yahoo odrzuca zapytania o świeczki śródsesyjne sięgające dalej wstecz (1m: najwyżej 8 dni na zapytanie)
+INTRADAY_MAX_DAYS = {'1m': 7, '2m': 59, '5m': 59, '15m': 59, '30m': 59, '90m': 59, '60m': 729, '1h': 729}
+
+PERIOD_OFFSETS = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+
+def period_start(period: str, interval: str = '1d') -> Optional[pd.Timestamp]:
+    """Zamienia okres w formacie yfinance na datę początkową (None = cała historia).
+
+    Dla świeczek śródsesyjnych początek nie sięga dalej niż pozwala Yahoo dla danego interwału.
+    """
+    now = pd.Timestamp.now().normalize()
+    if period == 'max':
+        start = None
+    elif period == 'ytd':
+        start = pd.Timestamp(year=now.year, month=1, day=1)
+    elif period in SESSION_PERIODS:
+        start = now - pd.DateOffset(days=SESSION_PERIODS[period] + SESSION_LOOKBACK_DAYS)
+    elif period in PERIOD_OFFSETS:
+        start = now - PERIOD_OFFSETS[period]
+    else:
+        raise ValueError(f"Nieobsługiwany okres: {period}")
+    return clamp_intraday_start(start, interval)
+
+
+def clamp_intraday_start(start: Optional[pd.Timestamp], interval: str) -> Optional[pd.Timestamp]:
+    if interval not in INTRADAY_MAX_DAYS:
+        return start
+    earliest = pd.Timestamp.now().normalize() - pd.DateOffset(days=INTRADAY_MAX_DAYS[interval])
+    if start is None:
+        return earliest
+    return max(start, _align_to_index(earliest, pd.DatetimeIndex([start])))
+
+
+def _align_to_index(ts: pd.Timestamp, index: pd.DatetimeIndex) -> pd.Timestamp:
+    if index.tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(index.tz)
+    if index.tz is None and ts.tzinfo is not None:
+        return ts.tz_convert(None)
+    return ts
+
+
+class PriceStore:
+    """Lokalny magazyn notowań OHLCV: jeden plik Parquet na parę (ticker, interwał)"""
+
+    def __init__(self):
+        self.meta = PersistentCache('price_store_meta', ttl=float('inf'))
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _path(self, ticker: str, interval: str) -> str:
+        safe_ticker = re.sub(r'[^A-Za-z0-9._-]', '_', ticker.upper())
+        return cache_path('prices', interval, f'{safe_ticker}.parquet')
+
+    def _load(self, key: Tuple[str, str]) -> Optional[pd.DataFrame]:
+        if key in self._frames:
+            return self._frames[key]
+        path = self._path(*key)
+        if not os.path.exists(path):
+            return None
+        try:
+            frame = pd.read_parquet(path)
+        except Exception as e:
+            print(f"Błąd odczytu magazynu notowań {path}: {e}")
+            return None
+        self._frames[key] = frame
+        return frame
+
+    def _save(self, key: Tuple[str, str], frame: pd.DataFrame) -> None:
+        path = self._path(*key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            frame.to_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Błąd zapisu magazynu notowań {path}: {e}")
+        self._frames[key] = frame
+
+    @staticmethod
+    def _fetch(tickers, interval: str, start: Optional[pd.Timestamp], **kwargs) -> pd.DataFrame:
+        # yfinance dopiero przy pierwszym pobraniu - świeże dane z magazynu go nie potrzebują
+        import yfinance as yf
+        if start is None:
+            return yf.download(tickers, period='max', interval=interval, progress=False, **kwargs)
+        if interval not in INTRADAY_INTERVALS and start.tzinfo is not None:
+            start = start.tz_convert(None)
+        # dociąganie ogona po długiej przerwie też musi zmieścić się w limicie Yahoo
+        start = clamp_intraday_start(start, interval)
+        return yf.download(tickers, start=start, interval=interval, progress=False, **kwargs)
+
+    @staticmethod
+    def _download(ticker: str, interval: str, start: Optional[pd.Timestamp]) -> pd.DataFrame:
+        data = PriceStore._fetch(ticker, interval, start)
+        if data is None or data.empty:
+            return pd.DataFrame()
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+        data.columns.name = None
+        return data.dropna(how='all').sort_index()
+
+    @staticmethod
+    def _download_many(tickers: List[str], interval: str, start: Optional[pd.Timestamp]) -> Dict[str, pd.DataFrame]:
+        if len(tickers) == 1:
+            return {tickers[0]: PriceStore._download(tickers[0], interval, start)}
+        data = PriceStore._fetch(tickers, interval, start, group_by='ticker')
+        frames = {}
+        if data is None or data.empty or not isinstance(data.columns, pd.MultiIndex):
+            return frames
+        for ticker in data.columns.get_level_values(0).unique():
+            frame = data[ticker].dropna(how='all').sort_index()
+            frame.columns.name = None
+            frames[str(ticker).upper()] = frame
+        return frames
+
+    def _plan(self, key: Tuple[str, str], start: Optional[pd.Timestamp]) -> Tuple[Optional[str], Optional[pd.Timestamp]]:
+        """Co trzeba pobrać: ('full', początek), ('tail', ostatnia świeczka) albo (None, None), gdy dane są świeże"""
+        ticker, interval = key
+        frame = self._load(key)
+        meta = self.meta.get(f'{ticker}|{interval}', None) or {}
+        covered_from = meta.get('covered_from')
+
+        if frame is not None and not frame.empty:
+            covered = covered_from == 'max' or (
+                start is not None and covered_from is not None
+                and pd.Timestamp(covered_from) <= start
+            )
+        else:
+            covered = False
+
+        if not covered:
+            # brak danych z żądanego zakresu - pełne pobranie od daty początkowej
+            return 'full', start
+
+        refresh_after = REFRESH_AFTER_INTRADAY if interval in INTRADAY_INTERVALS else REFRESH_AFTER_DAILY
+        if time.time() - meta.get('fetched_at', 0) < refresh_after:
+            return None, None
+        # dociągamy tylko ogon - ostatnia świeczka mogła być niepełna, więc ją nadpisujemy
+        last_bar = frame.index[-1]
+        return 'tail', last_bar if interval in INTRADAY_INTERVALS else last_bar.normalize()
+
+    def _apply(self, key: Tuple[str, str], mode: str, start: Optional[pd.Timestamp],
+               data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Scala pobrane dane z magazynem zgodnie z planem z _plan()"""
+        ticker, interval = key
+        frame = self._load(key)
+        meta_key = f'{ticker}|{interval}'
+
+        if mode == 'full':
+            if data.empty:
+                return frame
+            if frame is not None and not frame.empty:
+                data = pd.concat([frame[frame.index < _align_to_index(data.index[0], frame.index)], data])
+            self._save(key, data)
+            self.meta.set(meta_key, {
+                'covered_from': 'max' if start is None else start.isoformat(),
+                'fetched_at': time.time()
+            })
+            return data
+
+        if not data.empty:
+            tail_start = _align_to_index(data.index[0], frame.index)
+            frame = pd.concat([frame[frame.index < tail_start], data])
+            frame = frame[~frame.index.duplicated(keep='last')]
+            self._save(key, frame)
+        meta = self.meta.get(meta_key, None) or {}
+        meta['fetched_at'] = time.time()
+        self.meta.set(meta_key, meta)
+        return frame
+
+    def _refresh(self, key: Tuple[str, str], start: Optional[pd.Timestamp]) -> Optional[pd.DataFrame]:
+        mode, download_start = self._plan(key, start)
+        if mode is None:
+            return self._load(key)
+        return self._apply(key, mode, start, self._download(key[0], key[1], download_start))
+
+    def _slice(self, frame: Optional[pd.DataFrame], start: Optional[pd.Timestamp],
+               period: Optional[str] = None) -> pd.DataFrame:
+        if frame is None or frame.empty:
+            return pd.DataFrame()
+        if period in SESSION_PERIODS:
+            sessions = frame.index.normalize()
+            return frame[sessions >= sessions.unique()[-SESSION_PERIODS[period]:][0]].copy()
+        if start is None:
+            return frame.copy()
+        return frame[frame.index >= _align_to_index(start, frame.index)].copy()
+
+    def get_history(self, ticker: str, period: Optional[str] = None, interval: str = '1d',
+                    start: Optional[str] = None) -> pd.DataFrame:
+        """Zwraca notowania z magazynu, pobierając z sieci tylko brakujący zakres"""
+        key = (ticker.upper(), interval)
+        start_ts = pd.Timestamp(start) if start is not None else period_start(period or '1mo', interval)
+
+        with self._lock(key):
+            frame = self._refresh(key, start_ts)
+        return self._slice(frame, start_ts, period if start is None else None)
+
+    def get_histories(self, tickers: Iterable[str], period: Optional[str] = None, interval: str = '1d',
+                      start: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """get_history dla wielu tickerów; brakujące dane wszystkich tickerów pobierane są jednym zapytaniem"""
+        start_ts = pd.Timestamp(start) if start is not None else period_start(period or '1mo', interval)
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        keys = [(ticker, interval) for ticker in tickers]
+        for key in sorted(keys):
+            self._lock(key).acquire()
+        try:
+            plans = {key: self._plan(key, start_ts) for key in keys}
+            # cała historia i dociąganie od daty to dwa różne zapytania; wspólny początek = najwcześniejszy potrzebny
+            for full_history in (True, False):
+                group = [key for key, (mode, download_start) in plans.items()
+                         if mode and (download_start is None) == full_history]
+                if not group:
+                    continue
+                group_start = None if full_history else min(plans[key][1] for key in group)
+                downloaded = self._download_many([ticker for ticker, _ in group], interval, group_start)
+                for key in group:
+                    self._apply(key, plans[key][0], start_ts, downloaded.get(key[0], pd.DataFrame()))
+            sessions_period = period if start is None else None
+            return {ticker: self._slice(self._load((ticker, interval)), start_ts, sessions_period) for ticker in tickers}
+        finally:
+            for key in keys:
+                self._lock(key).release()
+
+_store: Optional[PriceStore] = None
+_store_lock = threading.Lock()
+
+def get_price_store() -> PriceStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore()
+    return _store
@@ -0,0 +1,238 @@
+"""Silnik wskaźników technicznych na tablicach NumPy (SMA, RSI, MACD, wstęgi Bollingera).
+
+Liczy wszystkie wskaźniki w jednym przebiegu po tablicy cen zamknięcia, także dla wielu tickerów naraz
+(kolumny tablicy 2-D), a po dopisaniu nowej świeczki aktualizuje je przyrostowo z zapamiętanego stanu.
+"""
+import threading
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+SMA_WINDOWS = (20, 50, 200)
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BB_WINDOW, BB_STDS = 20, 2
+
+INDICATOR_COLUMNS = [
+    'SMA20', 'SMA50', 'SMA200', 'RSI', 'EMA12', 'EMA26', 'MACD', 'Signal', 'MACD_Hist',
+    'BB_Middle', 'BB_Std', 'BB_Upper', 'BB_Lower', 'BB_Width'
+]
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Średnia krocząca jak pandas rolling(window).mean(): NaN dla pierwszych window-1 wierszy
+    i dla okien zawierających brakującą wartość (pojedynczy NaN nie psuje dalszej części szeregu)"""
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if len(values) < window:
+        return out
+    valid = ~np.isnan(values)
+    cumsum = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    cumcount = np.cumsum(valid, axis=0)
+    sums = cumsum[window - 1:].copy()
+    sums[1:] -= cumsum[:-window]
+    counts = cumcount[window - 1:].copy()
+    counts[1:] -= cumcount[:-window]
+    out[window - 1:] = np.where(counts == window, sums / window, np.nan)
+    return out
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Odchylenie standardowe z próby (ddof=1) w oknie, liczone na widoku okien bez kopiowania danych"""
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if len(values) < window:
+        return out
+    windows = sliding_window_view(values, window, axis=0)
+    out[window - 1:] = windows.std(axis=-1, ddof=1)
+    return out
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """EMA jak pandas ewm(span, adjust=False): jeden przebieg filtrem rekurencyjnym"""
+    # scipy.signal importuje się długo, a wykresy potrzebują tylko średnich kroczących
+    from scipy.signal import lfilter
+    values = np.asarray(values, dtype=float)
+    alpha = 2.0 / (span + 1)
+    if len(values) == 0:
+        return values.copy()
+    if np.isnan(values).any():
+        # luki w danych: wagi po przerwie liczy pandas (rzadki przypadek, filtr rekurencyjny przeniósłby NaN dalej)
+        return pd.DataFrame(values.reshape(len(values), -1)).ewm(span=span, adjust=False).mean() \
+            .to_numpy().reshape(values.shape)
+    zi = np.expand_dims((1 - alpha) * values[0], 0)
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], values, axis=0, zi=zi)
+    return out
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def compute_indicator_arrays(close: np.ndarray) -> Dict[str, np.ndarray]:
+    """Wszystkie wskaźniki dla tablicy cen (n,) albo (n, liczba_tickerów)"""
+    close = np.asarray(close, dtype=float)
+    result: Dict[str, np.ndarray] = {}
+    for window in SMA_WINDOWS:
+        result[f'SMA{window}'] = rolling_mean(close, window)
+
+    delta = np.zeros_like(close)
+    delta[1:] = np.diff(close, axis=0)
+    # zmiana przy brakującej cenie liczy się jako 0, jak delta.where(delta > 0, 0) w pandas
+    with np.errstate(invalid='ignore'):
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+    result['RSI'] = _rsi_from_averages(rolling_mean(gain, RSI_WINDOW), rolling_mean(loss, RSI_WINDOW))
+
+    result['EMA12'] = ema(close, MACD_FAST)
+    result['EMA26'] = ema(close, MACD_SLOW)
+    result['MACD'] = result['EMA12'] - result['EMA26']
+    result['Signal'] = ema(result['MACD'], MACD_SIGNAL)
+    result['MACD_Hist'] = result['MACD'] - result['Signal']
+
+    # środek wstęg to ta sama średnia co SMA20 - bez ponownego liczenia
+    result['BB_Middle'] = result['SMA20']
+    result['BB_Std'] = rolling_std(close, BB_WINDOW)
+    result['BB_Upper'] = result['BB_Middle'] + result['BB_Std'] * BB_STDS
+    result['BB_Lower'] = result['BB_Middle'] - result['BB_Std'] * BB_STDS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['BB_Width'] = (result['BB_Upper'] - result['BB_Lower']) / result['BB_Middle']
+    return result
+
+
+def add_indicators(df: pd.DataFrame, close_col: str = 'Close') -> pd.DataFrame:
+    data = df.copy()
+    close = data[close_col]
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    for name, values in compute_indicator_arrays(close.to_numpy(dtype=float)).items():
+        data[name] = values
+    return data
+
+
+def compute_many(closes: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Wskaźniki dla wielu tickerów naraz (kolumny = tickery, wspólny indeks dat)"""
+    values = closes.to_numpy(dtype=float)
+    complete = ~np.isnan(values).any(axis=0)
+    arrays = {name: np.full(values.shape, np.nan) for name in INDICATOR_COLUMNS}
+
+    if complete.any():
+        for name, result in compute_indicator_arrays(values[:, complete]).items():
+            arrays[name][:, complete] = result
+    # tickery z krótszą historią liczymy osobno, od pierwszej dostępnej świeczki
+    for col in np.flatnonzero(~complete):
+        series = closes.iloc[:, col]
+        first = series.first_valid_index()
+        if first is None:
+            continue
+        start = closes.index.get_loc(first)
+        for name, result in compute_indicator_arrays(series.iloc[start:].ffill().to_numpy()).items():
+            arrays[name][start:, col] = result
+
+    return {name: pd.DataFrame(array, index=closes.index, columns=closes.columns) for name, array in arrays.items()}
+
+
+class IndicatorState:
+    """Stan potrzebny do policzenia wskaźników dla kolejnej świeczki bez przeliczania całej historii"""
+
+    def __init__(self, close: np.ndarray, indicators: Dict[str, np.ndarray]):
+        close = np.asarray(close, dtype=float)
+        self.window = close[-max(SMA_WINDOWS):].copy()
+        self.deltas = np.diff(close[-(RSI_WINDOW + 1):]) if len(close) > 1 else np.array([])
+        if len(close) <= RSI_WINDOW:
+            self.deltas = np.concatenate(([0.0], self.deltas))
+        self.ema_fast = float(indicators['EMA12'][-1])
+        self.ema_slow = float(indicators['EMA26'][-1])
+        self.signal = float(indicators['Signal'][-1])
+        self.count = len(close)
+
+    def append(self, close: float) -> Dict[str, float]:
+        close = float(close)
+        delta = close - self.window[-1]
+        self.window = np.append(self.window, close)[-max(SMA_WINDOWS):]
+        self.deltas = np.append(self.deltas, delta)[-RSI_WINDOW:]
+        self.count += 1
+
+        row: Dict[str, float] = {}
+        for window in SMA_WINDOWS:
+            row[f'SMA{window}'] = float(self.window[-window:].mean()) if self.count >= window else np.nan
+        if self.count >= RSI_WINDOW:
+            row['RSI'] = float(_rsi_from_averages(
+                np.clip(self.deltas, 0, None).mean(), np.clip(-self.deltas, 0, None).mean()
+            ))
+        else:
+            row['RSI'] = np.nan
+
+        alpha_fast, alpha_slow, alpha_signal = (2.0 / (span + 1) for span in (MACD_FAST, MACD_SLOW, MACD_SIGNAL))
+        self.ema_fast = alpha_fast * close + (1 - alpha_fast) * self.ema_fast
+        self.ema_slow = alpha_slow * close + (1 - alpha_slow) * self.ema_slow
+        macd = self.ema_fast - self.ema_slow
+        self.signal = alpha_signal * macd + (1 - alpha_signal) * self.signal
+        row.update({
+            'EMA12': self.ema_fast, 'EMA26': self.ema_slow, 'MACD': macd,
+            'Signal': self.signal, 'MACD_Hist': macd - self.signal
+        })
+
+        row['BB_Middle'] = row['SMA20']
+        row['BB_Std'] = float(self.window[-BB_WINDOW:].std(ddof=1)) if self.count >= BB_WINDOW else np.nan
+        row['BB_Upper'] = row['BB_Middle'] + row['BB_Std'] * BB_STDS
+        row['BB_Lower'] = row['BB_Middle'] - row['BB_Std'] * BB_STDS
+        row['BB_Width'] = (row['BB_Upper'] - row['BB_Lower']) / row['BB_Middle'] if row['BB_Middle'] else np.nan
+        return row
+
+
+class IndicatorCache:
+    """Wskaźniki per ticker; gdy przybędzie kilka świeczek na końcu, liczymy tylko je"""
+    MAX_INCREMENTAL_BARS = 5
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, ticker: str, df: pd.DataFrame, close_col: str = 'Close') -> pd.DataFrame:
+        close = df[close_col].to_numpy(dtype=float)
+        key = ticker.upper()
+        with self._lock:
+            entry = self._entries.get(key)
+
+        frame: Optional[pd.DataFrame] = None
+        if entry is not None:
+            cached_frame, state = entry
+            n_cached = len(cached_frame)
+            new_bars = len(df) - n_cached
+            # stan przyrostowy zakłada ciągły szereg - przy brakujących cenach liczymy całość od nowa
+            if 0 <= new_bars <= self.MAX_INCREMENTAL_BARS and n_cached > 0 and not np.isnan(close).any() \
+                    and df.index[n_cached - 1] == cached_frame.index[-1] \
+                    and np.isclose(close[n_cached - 1], cached_frame[close_col].iloc[-1]):
+                if new_bars == 0:
+                    frame = cached_frame
+                else:
+                    state = _copy_state(state)
+                    rows = [state.append(value) for value in close[n_cached:]]
+                    tail = df.iloc[n_cached:].copy()
+                    for name in INDICATOR_COLUMNS:
+                        tail[name] = [row[name] for row in rows]
+                    frame = pd.concat([cached_frame, tail])
+
+        if frame is None:
+            frame = add_indicators(df, close_col)
+            state = IndicatorState(close, {name: frame[name].to_numpy() for name in ('EMA12', 'EMA26', 'Signal')})
+
+        with self._lock:
+            self._entries[key] = (frame, state)
+        return frame.copy()
+
+
+def _copy_state(state: IndicatorState) -> IndicatorState:
+    copied = IndicatorState.__new__(IndicatorState)
+    copied.__dict__.update({k: (v.copy() if isinstance(v, np.ndarray) else v) for k, v in state.__dict__.items()})
+    return copied
+
+
+_indicator_cache = IndicatorCache()
+
+def get_indicators(ticker: str, df: pd.DataFrame, close_col: str = 'Close') -> pd.DataFrame:
+    return _indicator_cache.get(ticker, df, close_col)
@@ -0,0 +1,111 @@
+"""Tłumaczenie partii tekstów z trwałym cache (skrót tekstu, język docelowy) i ograniczoną współbieżnością."""
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from finance_cache import SqliteCache, content_hash
+
+TRANSLATE_BACKEND = os.getenv('TRANSLATE_BACKEND', 'google')
+TRANSLATE_WORKERS = int(os.getenv('TRANSLATE_WORKERS', 8))
+TRANSLATE_CACHE_TTL = float(os.getenv('TRANSLATE_CACHE_TTL', 90 * 24 * 3600))
+TRANSLATE_TARGET = os.getenv('TRANSLATE_TARGET', 'pl')
+
+
+class TranslatorBackend(ABC):
+    """Interfejs tłumacza: jeden tekst -> tłumaczenie"""
+    name = 'base'
+
+    @abstractmethod
+    def translate(self, text: str, target: str, source: str = 'auto') -> str:
+        ...
+
+
+class GoogleTranslatorBackend(TranslatorBackend):
+    name = 'google'
+
+    def __init__(self):
+        # GoogleTranslator trzyma stan zapytania, więc każdy wątek ma własne instancje (po jednej na parę języków)
+        self._local = threading.local()
+
+    def translate(self, text: str, target: str, source: str = 'auto') -> str:
+        from deep_translator import GoogleTranslator
+        translators = getattr(self._local, 'translators', None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get((source, target))
+        if translator is None:
+            translator = translators[(source, target)] = GoogleTranslator(source=source, target=target)
+        return translator.translate(text)
+
+
+class StubTranslatorBackend(TranslatorBackend):
+    """Tłumaczenie bez sieci - do testów i pracy offline"""
+    name = 'stub'
+
+    def translate(self, text: str, target: str, source: str = 'auto') -> str:
+        return f'[{target}] {text}'
+
+
+TRANSLATOR_BACKENDS = {
+    GoogleTranslatorBackend.name: GoogleTranslatorBackend,
+    StubTranslatorBackend.name: StubTranslatorBackend,
+}
+
+_backends: Dict[str, TranslatorBackend] = {}
+_backends_lock = threading.Lock()
+
+def get_translator_backend(name: Optional[str] = None) -> TranslatorBackend:
+    name = name or TRANSLATE_BACKEND
+    if name not in TRANSLATOR_BACKENDS:
+        raise ValueError(f"Nieznany tłumacz: {name}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = TRANSLATOR_BACKENDS[name]()
+        return _backends[name]
+
+
+_cache = SqliteCache('translations', ttl=TRANSLATE_CACHE_TTL)
+_executor = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix='translate')
+
+
+def _translate_one(backend: TranslatorBackend, text: str, target: str, source: str) -> Optional[str]:
+    try:
+        return backend.translate(text, target, source) or None
+    except Exception as e:
+        print(f"Błąd tłumaczenia: {e}")
+        return None
+
+
+def translate_batch(texts: List[str], target: str = TRANSLATE_TARGET, source: str = 'auto') -> Dict[str, Any]:
+    """Tłumaczy listę tekstów: powtórzenia raz, trafienia z cache, reszta równolegle.
+
+    Tekst, którego nie udało się przetłumaczyć, zwracany jest bez zmian (i nie trafia do cache).
+    """
+    backend = get_translator_backend()
+    unique = list(dict.fromkeys(text for text in texts if isinstance(text, str) and text.strip()))
+    keys = {text: content_hash(backend.name, source, target, text) for text in unique}
+
+    stored = _cache.get_many(keys.values())
+    translations = {text: stored[key] for text, key in keys.items() if key in stored}
+    missing = [text for text in unique if text not in translations]
+
+    translated = dict(zip(missing, _executor.map(lambda text: _translate_one(backend, text, target, source), missing)))
+    _cache.set_many({keys[text]: value for text, value in translated.items() if value is not None})
+    failed = sum(1 for value in translated.values() if value is None)
+    translations.update({text: value for text, value in translated.items() if value is not None})
+
+    return {
+        'translations': [translations.get(text, text) for text in texts],
+        'stats': {
+            'texts': len(texts),
+            'unique': len(unique),
+            'cached': len(unique) - len(missing),
+            'translated': len(missing) - failed,
+            'failed': failed
+        }
+    }
+
+
+def translate_many(texts: List[str], target: str = TRANSLATE_TARGET, source: str = 'auto') -> List[str]:
+    return translate_batch(texts, target, source)['translations']
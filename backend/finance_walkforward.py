@@ -0,0 +1,173 @@
+"""Ocena modeli investbota metodą walk-forward (rozszerzające się okno treningowe).
+
+Każdy fold trenuje modele tylko na przeszłości i przewiduje kolejny okres, więc dokładność i krzywa kapitału
+są liczone wyłącznie poza próbą. Foldy liczone są równolegle w puli procesów; macierz cech trafia do plików .npy
+otwieranych przez procesy robocze jako memmap, bez kopiowania danych do każdego zadania.
+
+Użycie offline: python finance_walkforward.py AAPL MSFT CDR.WA --period 5y --output raport.json
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, mean_absolute_error
+from sklearn.preprocessing import StandardScaler
+from finance_cache import cache_path
+from finance_investbot import (
+    MODEL_FEATURES, RETURN_HORIZON, build_classifier, build_regressor, get_stock_data_many, prepare_features_many,
+    prepare_backtest_data, calculate_risk_metrics
+)
+
+WALK_FORWARD_WORKERS = int(os.getenv('WALK_FORWARD_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+WALK_FORWARD_MIN_TRAIN = int(os.getenv('WALK_FORWARD_MIN_TRAIN', 250))
+WALK_FORWARD_TEST_SIZE = int(os.getenv('WALK_FORWARD_TEST_SIZE', 63))
+
+ARRAY_NAMES = ('X', 'target', 'returns')
+
+
+def walk_forward_folds(n_rows: int, min_train: int = WALK_FORWARD_MIN_TRAIN, test_size: int = WALK_FORWARD_TEST_SIZE,
+                       purge: int = RETURN_HORIZON) -> List[Tuple[int, int, int]]:
+    """(koniec treningu, początek testu, koniec testu) dla kolejnych foldów.
+
+    Etykiety ostatnich `purge` wierszy przed testem zależą od cen z okresu testowego, więc nie trafiają do treningu.
+    """
+    return [
+        (test_start - purge, test_start, min(test_start + test_size, n_rows))
+        for test_start in range(min_train, n_rows, test_size)
+    ]
+
+
+def _write_arrays(directory: str, prepared_data: pd.DataFrame) -> None:
+    X = np.nan_to_num(prepared_data[MODEL_FEATURES].to_numpy(dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+    returns = prepared_data['Return_5day'].to_numpy(dtype=float)
+    arrays = {
+        'X': X,
+        'target': prepared_data['Target_5day'].to_numpy(dtype=np.int8),
+        'returns': np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+    }
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(directory, f'{name}.npy'), arrays[name])
+
+
+def evaluate_fold(directory: str, train_end: int, test_start: int, test_end: int) -> Dict[str, Any]:
+    """Trening na wierszach [0, train_end) i prognoza dla [test_start, test_end) - uruchamiane w procesie roboczym"""
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in ARRAY_NAMES}
+    X, target, returns = arrays['X'], arrays['target'], arrays['returns']
+    started = time.perf_counter()
+
+    scaler = StandardScaler().fit(X[:train_end])
+    X_train = scaler.transform(X[:train_end])
+    X_test = scaler.transform(X[test_start:test_end])
+    # procesów jest już tyle co rdzeni - las losowy liczymy w jednym wątku
+    classifier = build_classifier(n_jobs=1).fit(X_train, target[:train_end])
+    regressor = build_regressor().fit(X_train, returns[:train_end])
+    predictions = classifier.predict(X_test)
+
+    return {
+        'train_rows': train_end,
+        'test_start': test_start,
+        'test_end': test_end,
+        'predictions': predictions.astype(int).tolist(),
+        'accuracy': float(accuracy_score(target[test_start:test_end], predictions) * 100),
+        'mae': float(mean_absolute_error(returns[test_start:test_end], regressor.predict(X_test))),
+        'fit_time': round(time.perf_counter() - started, 3)
+    }
+
+
+def walk_forward_evaluate(prepared_data: pd.DataFrame, min_train: int = WALK_FORWARD_MIN_TRAIN,
+                          test_size: int = WALK_FORWARD_TEST_SIZE, max_workers: int = WALK_FORWARD_WORKERS,
+                          executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """Dokładność, metryki ryzyka i krzywa kapitału poza próbą dla danych z prepare_features()"""
+    folds = walk_forward_folds(len(prepared_data), min_train, test_size)
+    if not folds:
+        raise ValueError(f"Za mało danych do oceny walk-forward: potrzeba ponad {min_train} wierszy.")
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(cache_path('walkforward', 'x'))) as directory:
+        _write_arrays(directory, prepared_data)
+        train_ends, test_starts, test_ends = zip(*folds)
+        args = ([directory] * len(folds), train_ends, test_starts, test_ends)
+        if executor is not None:
+            results = list(executor.map(evaluate_fold, *args))
+        elif max_workers > 1 and len(folds) > 1:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(folds))) as pool:
+                results = list(pool.map(evaluate_fold, *args))
+        else:
+            results = list(map(evaluate_fold, *args))
+
+    predictions = np.concatenate([fold.pop('predictions') for fold in results])
+    test_data = prepared_data.iloc[folds[0][1]:]
+    returns = test_data['Return_5day'].values
+    dates = prepared_data.index.strftime('%Y-%m-%d')
+    for fold in results:
+        fold['test_from'] = dates[fold['test_start']]
+        fold['test_to'] = dates[fold['test_end'] - 1]
+
+    return {
+        'folds': results,
+        'oos_rows': len(test_data),
+        'oos_accuracy': float(accuracy_score(test_data['Target_5day'].values, predictions) * 100),
+        'backtest_data': prepare_backtest_data(test_data, predictions, returns),
+        'risk_metrics': calculate_risk_metrics(test_data, predictions, returns),
+        'evaluation_time': round(time.perf_counter() - started, 3)
+    }
+
+
+def evaluate_universe(tickers: List[str], period: str = '5y', min_train: int = WALK_FORWARD_MIN_TRAIN,
+                      test_size: int = WALK_FORWARD_TEST_SIZE, max_workers: int = WALK_FORWARD_WORKERS) -> Dict[str, Any]:
+    """Walk-forward dla listy tickerów; jedna pula procesów obsługuje foldy wszystkich tickerów"""
+    reports: Dict[str, Any] = {}
+    prepared = prepare_features_many(get_stock_data_many(tickers, period=period))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for ticker, prepared_data in prepared.items():
+            try:
+                if isinstance(prepared_data, Exception):
+                    raise prepared_data
+                reports[ticker] = walk_forward_evaluate(prepared_data, min_train, test_size, executor=executor)
+            except Exception as e:
+                reports[ticker] = {'error': str(e)}
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('tickers', nargs='*')
+    parser.add_argument('--universe', help='plik z listą tickerów (jeden w wierszu)')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--min-train', type=int, default=WALK_FORWARD_MIN_TRAIN)
+    parser.add_argument('--test-size', type=int, default=WALK_FORWARD_TEST_SIZE)
+    parser.add_argument('--workers', type=int, default=WALK_FORWARD_WORKERS)
+    parser.add_argument('--output', help='zapisz pełny raport (z krzywymi kapitału) do pliku JSON')
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.universe:
+        with open(args.universe, encoding='utf-8') as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not tickers:
+        parser.error("Podaj tickery albo plik --universe.")
+
+    reports = evaluate_universe(tickers, args.period, args.min_train, args.test_size, args.workers)
+
+    print(f"{'ticker':<10}{'foldy':>7}{'wiersze':>9}{'trafność%':>11}{'sharpe':>8}{'max DD%':>9}{'strategia':>11}{'k&t':>9}{'czas[s]':>9}")
+    for ticker, report in reports.items():
+        if 'error' in report:
+            print(f"{ticker:<10} błąd: {report['error']}")
+            continue
+        backtest, metrics = report['backtest_data'], report['risk_metrics']
+        print(f"{ticker:<10}{len(report['folds']):>7}{report['oos_rows']:>9}{report['oos_accuracy']:>11.2f}"
+              f"{metrics['sharpe_ratio']:>8.2f}{metrics['max_drawdown']:>9.2f}"
+              f"{backtest['ai_strategy'][-1]:>11.1f}{backtest['buy_hold'][-1]:>9.1f}{report['evaluation_time']:>9.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Produkcyjne uruchomienie API: gunicorn -c gunicorn.conf.py app:app (z katalogu backend).
+
+Aplikacja i biblioteki potrzebne do obsługi zapytań ładowane są raz w procesie głównym (preload_app),
+a procesy robocze dziedziczą je przy forku. Każdy proces roboczy ma WEB_THREADS wątków; prognozy i investbot
+liczą się we własnej puli procesów (JOB_WORKERS na proces roboczy). Na ich wynik - zwykły, strumień SSE
+(/api/investbot/stream) albo NDJSON (/api/investbot/batch) - może naraz czekać najwyżej HEAVY_REQUEST_SLOTS
+wątków na proces roboczy, strumień trzyma slot aż do zamknięcia. Przy WEB_THREADS > HEAVY_REQUEST_SLOTS
+pozostałe wątki obsługują tanie endpointy (wykresy, newsy), a nadmiarowe ciężkie zapytania dostają 503
+z Retry-After (frontend ponawia je po tym czasie).
+"""
+import os
+from finance_startup import preload_modules
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_WORKERS', 2))
+threads = int(os.getenv('WEB_THREADS', 8))
+worker_class = 'gthread'
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+preload_app = True
+accesslog = os.getenv('WEB_ACCESS_LOG', '-')
+
+
+# plik konfiguracji wykonywany jest w procesie głównym jeszcze przed załadowaniem aplikacji
+_timings = preload_modules()
+
+
+def on_starting(server):
+    server.log.info("Wstępnie załadowane moduły: %s (%.2fs)",
+                    ', '.join(f'{name} {seconds:.2f}s' for name, seconds in _timings.items()),
+                    sum(_timings.values()))
+
+
+def post_fork(server, worker):
+    # wątek harmonogramu musi powstać w procesie roboczym - z procesu głównego nie przechodzi przez fork
+    from finance_jobs import start_retrain_scheduler
+    start_retrain_scheduler()
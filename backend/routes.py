@@ -1,14 +1,82 @@
-from flask import Blueprint, request, jsonify
+import os
+import json
+import threading
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from finance_charts_utils import get_stock_data_by_ticker, get_stock_data_by_company_name
 from finance_indicators import get_financial_indicators
-from finance_predictions import predict_stock_prices
 from finance_news import get_news_with_sentiment
-from finance_investbot import get_investment_advice
-from deep_translator import GoogleTranslator
+from finance_jobs import get_job_manager, JobQueueFull, JOB_MAX_PENDING
+from finance_startup import preloaded_modules
+from finance_cache import cache_path
+from finance_translate import translate_batch
+from finance_http_cache import cached_response
+from finance_store import INTRADAY_INTERVALS
 
 routes = Blueprint('routes', __name__)
 
+INVESTBOT_BATCH_MAX = int(os.getenv('INVESTBOT_BATCH_MAX', 50))
+TRANSLATE_BATCH_MAX = int(os.getenv('TRANSLATE_BATCH_MAX', 500))
+# ile wątków serwera może naraz czekać na prognozę/investbota; pozostałe obsługują tanie endpointy (wykresy, newsy)
+HEAVY_REQUEST_SLOTS = int(os.getenv('HEAVY_REQUEST_SLOTS', 4))
+HEAVY_SLOT_WAIT = float(os.getenv('HEAVY_SLOT_WAIT', 1))
+# po ilu sekundach klient może ponowić zapytanie odrzucone z braku wolnego slotu (zadanie liczy się dalej w tle)
+HEAVY_RETRY_AFTER = int(os.getenv('HEAVY_RETRY_AFTER', 5))
+
+# jak długo (s) odpowiedź GET może być podawana z cache i przez przeglądarkę
+HTTP_TTL_CHART_INTRADAY = float(os.getenv('HTTP_TTL_CHART_INTRADAY', 60))
+HTTP_TTL_CHART_DAILY = float(os.getenv('HTTP_TTL_CHART_DAILY', 15 * 60))
+HTTP_TTL_INDICATORS = float(os.getenv('HTTP_TTL_INDICATORS', 6 * 3600))
+HTTP_TTL_NEWS = float(os.getenv('HTTP_TTL_NEWS', 10 * 60))
+
+CHART_DEFAULTS = {'period': '1mo', 'interval': '1d'}
+
+_heavy_slots = threading.BoundedSemaphore(HEAVY_REQUEST_SLOTS)
+
+def _chart_ttl(params):
+    return HTTP_TTL_CHART_INTRADAY if params['interval'] in INTRADAY_INTERVALS else HTTP_TTL_CHART_DAILY
+
+def _wants_async():
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+def _busy_response(job_id=None):
+    payload = {'error': 'Serwer jest zajęty obliczeniami, spróbuj ponownie za chwilę.'}
+    if job_id:
+        payload['job_id'] = job_id
+    response = jsonify(payload)
+    response.headers['Retry-After'] = str(HEAVY_RETRY_AFTER)
+    return response, 503
+
+def _run_heavy(kind, **params):
+    """Zadanie obliczeniowe w puli procesów. Gdy wszystkie sloty na ciężkie zapytania są zajęte, zwracamy 503
+    z Retry-After zamiast blokować wątek - zadanie liczy się dalej, a ponowione zapytanie dostanie gotowy wynik.
+    202 z identyfikatorem zadania zwracamy tylko przy ?async=1 (klient, który umie odpytywać /api/jobs)."""
+    job_id = get_job_manager().submit(kind, **params)
+    if not _heavy_slots.acquire(timeout=HEAVY_SLOT_WAIT):
+        return _busy_response(job_id)
+    try:
+        return jsonify(get_job_manager().wait(job_id))
+    finally:
+        _heavy_slots.release()
+
+def _stream_heavy(generate, mimetype, headers=None):
+    """Odpowiedź strumieniowa trzymająca slot ciężkiego zapytania aż do zamknięcia strumienia (także po
+    rozłączeniu klienta). None, gdy slotu nie udało się zająć - wołający odpowiada wtedy 503 z Retry-After."""
+    if not _heavy_slots.acquire(timeout=HEAVY_SLOT_WAIT):
+        return None
+    response = Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
+    response.call_on_close(_heavy_slots.release)
+    return response
+
+def _job_accepted(job_id):
+    job = get_job_manager().get(job_id)
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'] if job else 'queued',
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
 @routes.route('/api/stock_data_by_ticker', methods=['GET'])
+@cached_response(_chart_ttl, defaults=CHART_DEFAULTS)
 def stock_data_by_ticker_endpoint():
     ticker = request.args.get('ticker')
     period = request.args.get('period', '1mo')
@@ -27,6 +95,7 @@ def stock_data_by_ticker_endpoint():
         return jsonify({'error': str(e)}), 500
 
 @routes.route('/api/stock_data_by_company_name', methods=['GET'])
+@cached_response(_chart_ttl, defaults=CHART_DEFAULTS)
 def stock_data_by_company_name_endpoint():
     company_name = request.args.get('name')
     period = request.args.get('period', '1mo')
@@ -45,6 +114,7 @@ def stock_data_by_company_name_endpoint():
         return jsonify({'error': str(e)}), 500
 
 @routes.route('/api/indicators', methods=['GET'])
+@cached_response(HTTP_TTL_INDICATORS)
 def fetch_indicators_endpoint():
     ticker = request.args.get('ticker')
     if not ticker:
@@ -67,17 +137,36 @@ def predict_stock():
     ticker = request.args.get('ticker')
     periods = int(request.args.get('periods', 30))
     start_date = request.args.get('start_date', "2000-01-01")
+    response_format = request.args.get('format', 'records')
+    max_points = request.args.get('max_points', type=int)
+    order_selection = request.args.get('order', 'fixed')
 
     if not ticker:
         return jsonify({'error': 'Musisz podać ticker.'}), 400
+    if response_format not in ('records', 'compact'):
+        return jsonify({'error': 'Parametr format musi mieć wartość "records" lub "compact".'}), 400
+    if order_selection not in ('fixed', 'aic', 'bic', 'holdout'):
+        return jsonify({'error': 'Parametr order musi mieć wartość "fixed", "aic", "bic" lub "holdout".'}), 400
 
     try:
-        result = predict_stock_prices(ticker=ticker, periods=periods, start_date=start_date)
-        return jsonify(result)
+        params = {
+            'ticker': ticker,
+            'periods': periods,
+            'start_date': start_date,
+            'response_format': response_format,
+            'max_points': max_points,
+            'order_selection': order_selection
+        }
+        if _wants_async():
+            return _job_accepted(get_job_manager().submit('predict_stock', **params))
+        return _run_heavy('predict_stock', **params)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': f'Wyjątek: {str(e)}'}), 500
     
 @routes.route('/api/news', methods=['GET'])
+@cached_response(HTTP_TTL_NEWS)
 def fetch_news_endpoint():
     ticker = request.args.get('ticker')
     
@@ -85,7 +174,9 @@ def fetch_news_endpoint():
         return jsonify({'error': 'Musisz podać ticker.'}), 400
 
     try:
-        news_data = get_news_with_sentiment(ticker)
+        # translate=pl zwraca tytuły i opisy od razu przetłumaczone (tłumaczenie w cache po stronie serwera)
+        options = {'translate_to': request.args['translate']} if request.args.get('translate') else {}
+        news_data = get_news_with_sentiment(ticker, **options)
         return jsonify(news_data)
     except Exception as e:
         return jsonify({'error': f'Wyjątek: {str(e)}'}), 500
@@ -99,12 +190,13 @@ def translate_text():
         if not text:
             return jsonify({'error': 'Brak tekstu do tłumaczenia'}), 400
 
-        translator = GoogleTranslator(source='auto', target='pl')
-        translated = translator.translate(text)
+        result = translate_batch([text], target='pl')
+        if result['stats']['failed']:
+            raise ValueError('Nie udało się przetłumaczyć tekstu')
 
         return jsonify({
             'status': 'success',
-            'translated_text': translated
+            'translated_text': result['translations'][0]
         })
     except Exception as e:
         print(f"Błąd tłumaczenia: {str(e)}")
@@ -113,6 +205,24 @@ def translate_text():
             'error': str(e)
         }), 500
 
+@routes.route('/api/translate/batch', methods=['POST'])
+def translate_batch_endpoint():
+    data = request.get_json(silent=True) or {}
+    texts = data.get('texts')
+    target = data.get('target', 'pl')
+
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({'status': 'error', 'error': 'Pole texts musi być listą tekstów'}), 400
+    if len(texts) > TRANSLATE_BATCH_MAX:
+        return jsonify({'status': 'error', 'error': f'Maksymalnie {TRANSLATE_BATCH_MAX} tekstów w jednym zapytaniu'}), 400
+
+    try:
+        result = translate_batch(texts, target=target)
+        return jsonify({'status': 'success', **result})
+    except Exception as e:
+        print(f"Błąd tłumaczenia: {str(e)}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
+
 @routes.route('/api/investbot', methods=['GET'])
 def investbot_endpoint():
     ticker = request.args.get('ticker')
@@ -120,9 +230,124 @@ def investbot_endpoint():
         return jsonify({'error': 'Musisz podać ticker.'}), 400
 
     try:
-        advice = get_investment_advice(ticker)
-        if isinstance(advice, dict) and 'error' in advice:
-            return jsonify({'error': advice['error']}), 500
-        return jsonify(advice)
+        if _wants_async():
+            return _job_accepted(get_job_manager().submit('investbot', ticker=ticker))
+        return _run_heavy('investbot', ticker=ticker)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
-        return jsonify({'error': f'Wyjątek: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Wyjątek: {str(e)}'}), 500
+
+@routes.route('/api/investbot/stream', methods=['GET'])
+def investbot_stream_endpoint():
+    """Server-sent events: najpierw wynik modeli ilościowych, potem porada AI fragment po fragmencie"""
+    ticker = request.args.get('ticker')
+    if not ticker:
+        return jsonify({'error': 'Musisz podać ticker.'}), 400
+
+    from finance_investbot import stream_ai_insights
+
+    def event(name, payload):
+        return f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+    try:
+        # zadanie zlecamy przed zajęciem slotu - po 503 liczy się dalej, a ponowione zapytanie dostanie wynik
+        job_id = get_job_manager().submit('investbot', ticker=ticker, include_insights=False)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+
+    def generate():
+        try:
+            advice = get_job_manager().wait(job_id)
+        except Exception as e:
+            yield event('error', {'error': str(e)})
+            return
+        yield event('advice', advice)
+        try:
+            for chunk in stream_ai_insights(advice):
+                yield event('insight', {'text': chunk})
+        except Exception as e:
+            yield event('error', {'error': f'Błąd AI: {str(e)}'})
+            return
+        yield event('done', {})
+
+    response = _stream_heavy(generate, 'text/event-stream', {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return response if response is not None else _busy_response(job_id)
+
+@routes.route('/api/investbot/batch', methods=['GET', 'POST'])
+def investbot_batch_endpoint():
+    """Porady dla wielu tickerów; wyniki wysyłane jako NDJSON w kolejności kończenia się zadań"""
+    if request.method == 'POST':
+        tickers = (request.get_json(silent=True) or {}).get('tickers') or []
+    else:
+        tickers = request.args.get('tickers', '').split(',')
+    tickers = list(dict.fromkeys(str(t).strip().upper() for t in tickers if str(t).strip()))
+
+    if not tickers:
+        return jsonify({'error': 'Musisz podać listę tickerów.'}), 400
+    if len(tickers) > INVESTBOT_BATCH_MAX:
+        return jsonify({'error': f'Maksymalnie {INVESTBOT_BATCH_MAX} tickerów w jednym zapytaniu.'}), 400
+
+    # import dopiero tutaj - modele ML i tak liczą się w procesach roboczych
+    from finance_investbot import get_stock_data_many, prepare_features_many
+
+    def line(payload):
+        return json.dumps(payload, ensure_ascii=False, default=str) + '\n'
+
+    def generate():
+        manager = get_job_manager()
+        try:
+            # jedno pobranie notowań i wspólne liczenie wskaźników dla całej listy
+            prepared = prepare_features_many(get_stock_data_many(tickers))
+        except Exception as e:
+            for ticker in tickers:
+                yield line({'ticker': ticker, 'status': 'error', 'error': f'Wyjątek: {str(e)}'})
+            return
+
+        job_tickers = {}
+        for ticker in tickers:
+            data = prepared.get(ticker, ValueError(f'Nie znaleziono danych dla tickera {ticker}'))
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                job_tickers[manager.submit('investbot', ticker=ticker, prepared_data=data)] = ticker
+            except Exception as e:
+                yield line({'ticker': ticker, 'status': 'error', 'error': str(e)})
+
+        for job_id, result, error in manager.as_completed(job_tickers):
+            if error:
+                yield line({'ticker': job_tickers[job_id], 'status': 'error', 'error': error})
+            else:
+                yield line({'ticker': job_tickers[job_id], 'status': 'done', 'result': result})
+
+    response = _stream_heavy(generate, 'application/x-ndjson')
+    return response if response is not None else _busy_response()
+
+@routes.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status_endpoint(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': f'Nie znaleziono zadania "{job_id}".'}), 404
+    return jsonify(job)
+
+@routes.route('/api/health', methods=['GET'])
+def health_endpoint():
+    return jsonify({'status': 'ok'})
+
+@routes.route('/api/ready', methods=['GET'])
+def readiness_endpoint():
+    """Gotowość do przyjmowania ruchu: zapisywalny katalog cache i miejsce w kolejce zadań"""
+    pending = get_job_manager().pending_count()
+    checks = {
+        'cache_writable': os.access(os.path.dirname(cache_path('ready')), os.W_OK),
+        'job_queue': pending < JOB_MAX_PENDING
+    }
+    ready = all(checks.values())
+    return jsonify({
+        'status': 'ready' if ready else 'unavailable',
+        'checks': checks,
+        'pending_jobs': pending,
+        'preloaded_modules': preloaded_modules()
+    }), 200 if ready else 503
@@ -0,0 +1,45 @@
+import types
+
+import pandas as pd
+import pytest
+
+from finance_store import PriceStore, clamp_intraday_start, period_start
+
+# Yahoo przyjmuje najwyżej 8 dni świeczek 1m na zapytanie i 60 dni dla pozostałych interwałów poniżej godziny
+YAHOO_LIMITS = {'1m': pd.Timedelta(days=8), '5m': pd.Timedelta(days=60), '15m': pd.Timedelta(days=60)}
+
+
+@pytest.mark.parametrize('interval', sorted(YAHOO_LIMITS))
+@pytest.mark.parametrize('period', ['1d', '5d', '1mo', '1y', 'max'])
+def test_intraday_period_start_within_yahoo_limit(period, interval):
+    start = period_start(period, interval)
+    assert start is not None
+    assert pd.Timestamp.now() - start < YAHOO_LIMITS[interval]
+
+
+def test_daily_period_start_not_clamped():
+    assert period_start('max') is None
+    assert pd.Timestamp.now() - period_start('1y') > pd.Timedelta(days=360)
+
+
+def test_five_sessions_fit_in_1m_window():
+    # 7 dni kalendarzowych zawsze obejmuje 5 sesji (poza tygodniami ze świętami)
+    assert pd.Timestamp.now().normalize() - period_start('5d', '1m') >= pd.Timedelta(days=7)
+
+
+def test_clamp_keeps_timezone_of_start():
+    start = pd.Timestamp('2000-01-03 09:30', tz='America/New_York')
+    clamped = clamp_intraday_start(start, '1m')
+    assert clamped.tzinfo is not None
+    assert pd.Timestamp.now(tz='America/New_York') - clamped < YAHOO_LIMITS['1m']
+
+
+def test_fetch_clamps_stale_tail_start(monkeypatch):
+    calls = []
+    fake_yf = types.SimpleNamespace(download=lambda tickers, **kwargs: calls.append(kwargs) or pd.DataFrame())
+    monkeypatch.setitem(__import__('sys').modules, 'yfinance', fake_yf)
+
+    PriceStore._fetch('AAPL', '1m', pd.Timestamp('2020-01-02 15:59', tz='America/New_York'))
+
+    assert pd.Timestamp.now(tz='America/New_York') - calls[0]['start'] < YAHOO_LIMITS['1m']
+    assert calls[0]['interval'] == '1m'
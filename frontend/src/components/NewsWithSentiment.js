@@ -45,14 +45,14 @@ function NewsWithSentiment({ ticker }) {
     all: '📰'
   };
 
-  const translateText = async (text) => {
+  const translateTexts = async (texts) => {
     try {
-      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:5000'}/api/translate`, {
+      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:5000'}/api/translate/batch`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ text })
+        body: JSON.stringify({ texts, target: 'pl' })
       });
 
       if (!response.ok) {
@@ -61,13 +61,13 @@ function NewsWithSentiment({ ticker }) {
 
       const data = await response.json();
       if (data.status === 'success') {
-        return data.translated_text;
+        return data.translations;
       } else {
         throw new Error(data.error || 'Błąd tłumaczenia');
       }
     } catch (error) {
       console.error('Błąd tłumaczenia:', error);
-      return text; 
+      return texts; 
     }
   };
 
@@ -106,7 +106,7 @@ function NewsWithSentiment({ ticker }) {
     try {
       setLoading(true);
       setError(null);
-      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:5000'}/api/news?ticker=${encodeURIComponent(ticker)}`);
+      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:5000'}/api/news?ticker=${encodeURIComponent(ticker)}&translate=pl`);
       
       if (!response.ok) {
         throw new Error(`Błąd serwera: ${response.status}`);
@@ -115,14 +115,16 @@ function NewsWithSentiment({ ticker }) {
       const data = await response.json();
       
       if (data.status === "success" && data.data) {
-        // Tłumaczenie newsów
-        const translatedNews = await Promise.all(
-          data.data.all.map(async (news) => ({
-            ...news,
-            title: await translateText(news.title),
-            description: await translateText(news.description)
-          }))
-        );
+        // Serwer zwykle tłumaczy newsy sam; jeśli nie, tłumaczymy tytuły i opisy w jednym zapytaniu
+        const articles = data.data.all;
+        const translations = data.data.translated === 'pl'
+          ? articles.flatMap(news => [news.title, news.description])
+          : await translateTexts(articles.flatMap(news => [news.title || '', news.description || '']));
+        const translatedNews = articles.map((news, i) => ({
+          ...news,
+          title: translations[2 * i] || news.title,
+          description: translations[2 * i + 1] || news.description
+        }));
 
         const translatedData = {
           ...data.data,
@@ -74,9 +74,24 @@ export async function fetchFinancialIndicators(ticker) {
 
 // Dodaj tę funkcję do istniejącego pliku api.js
 // Dodaj tę funkcję do istniejącego pliku api.js
+// Prognozy i investbot: przy zajętym serwerze backend odpowiada 503 z Retry-After, a zadanie liczy się dalej
+// w tle - ponawiamy zapytanie po wskazanym czasie, aż dostaniemy gotowy wynik
+const HEAVY_MAX_RETRIES = 6;
+
+async function fetchHeavy(url) {
+  for (let attempt = 0; ; attempt++) {
+    const response = await fetch(url);
+    const retryAfter = Number(response.headers.get('Retry-After'));
+    if (response.status !== 503 || !retryAfter || attempt >= HEAVY_MAX_RETRIES) {
+      return response;
+    }
+    await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+  }
+}
+
 export async function fetchStockPrediction(ticker) {
   const url = `${API_BASE_URL}/predict_stock?ticker=${encodeURIComponent(ticker)}&periods=30`;
-  const response = await fetch(url);
+  const response = await fetchHeavy(url);
   if (!response.ok) {
     const errorData = await response.json();
     throw new Error(errorData.error || 'Nieznany błąd.');
@@ -98,7 +113,7 @@ export async function fetchNewsWithSentiment(ticker) {
 
 export async function fetchInvestmentAdvice(ticker) {
   const url = `${API_BASE_URL}/investbot?ticker=${encodeURIComponent(ticker)}`;
-  const response = await fetch(url);
+  const response = await fetchHeavy(url);
   if (!response.ok) {
     const errorData = await response.json();
     throw new Error(errorData.error || 'Nieznany błąd.');